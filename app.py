@@ -3,19 +3,59 @@
 # =========================
 
 import streamlit as st
+import os
 import random
 import time
 
+# Worker processes for long document mode: REWRITER_WORKERS when set, else every CPU core
+DOCUMENT_WORKERS = int(os.environ.get('REWRITER_WORKERS') or os.cpu_count() or 1)
+
 # IMPORT BACKEND FUNCTIONS
 try:
-    from backend import extreme_rewriter, calculate_similarity, get_vocabulary_stats, guarantee_low_similarity
+    import backend
     BACKEND_AVAILABLE = True
+
+    @st.cache_resource(show_spinner="🧬 Loading DNA vocabulary engine...")
+    def load_backend():
+        """Vocabulary and rewriter, built once per server process and shared by all sessions"""
+        backend.get_rewriter()
+        return backend
+
+    def extreme_rewriter(text, seed=None, grammar=None):
+        return load_backend().extreme_rewriter(text, seed, grammar)
+
+    def calculate_similarity(original, rewritten):
+        return load_backend().calculate_similarity(original, rewritten)
+
+    def get_vocabulary_stats():
+        return load_backend().get_vocabulary_stats()
+
+    def guarantee_low_similarity(text, max_similarity=20, max_attempts=5, style="Balanced", progress=None, seed=None,
+                                 grammar=None):
+        # repeats are served by the backend result cache, which keeps only seeded
+        # rewrites that met their target, so unseeded clicks still draw new attempts
+        return load_backend().guarantee_low_similarity(text, max_similarity, max_attempts, progress=progress,
+                                                       seed=seed, grammar=grammar)
+
+    def stream_rewrite(text, max_similarity=20, max_attempts=5, seed=None, grammar=None):
+        return load_backend().stream_rewrite(text, max_similarity, max_attempts, seed=seed, grammar=grammar)
+
+    def join_chunks(chunks):
+        return load_backend().join_chunks(chunks)
+
+    def rewrite_document(text, max_similarity=20, max_attempts=5, progress=None, seed=None, grammar=None):
+        return load_backend().rewrite_document(text, max_similarity, max_attempts, workers=DOCUMENT_WORKERS,
+                                               progress=progress, seed=seed, grammar=grammar)
+
+    def reload_backend():
+        """Rebuild the shared engine and drop cached results"""
+        load_backend().reload_backend()
 except ImportError as e:
     BACKEND_AVAILABLE = False
     st.error(f"Backend not available: {e}")
 
     # Fallback functions
-    def extreme_rewriter(text):
+    def extreme_rewriter(text, seed=None, grammar=None):
         return text + " (rewritten)"
 
     def calculate_similarity(original, rewritten):
@@ -30,11 +70,15 @@ except ImportError as e:
             "vocabulary_loaded": True
         }
 
-    def guarantee_low_similarity(text, max_similarity=20, max_attempts=3):
+    def guarantee_low_similarity(text, max_similarity=20, max_attempts=3, style="Balanced", progress=None, seed=None,
+                                 grammar=None):
         rewritten = extreme_rewriter(text)
         similarity = calculate_similarity(text, rewritten)
         return rewritten, similarity
 
+    def rewrite_document(text, max_similarity=20, max_attempts=3, progress=None, seed=None, grammar=None):
+        return guarantee_low_similarity(text, max_similarity, max_attempts)
+
 st.set_page_config(page_title="Extreme DNA Rewriter", page_icon="🧬", layout="wide")
 
 # =========================
@@ -646,6 +690,17 @@ except Exception as e:
     </div>
     """, unsafe_allow_html=True)
 
+# =========================
+# ENGINE HEALTH (SIDEBAR)
+# =========================
+if BACKEND_AVAILABLE:
+    with st.sidebar:
+        with st.expander("🩺 Engine Health"):
+            st.json(load_backend().backend_health())
+            if st.button("🔄 Reload Vocabulary", use_container_width=True):
+                reload_backend()
+                st.rerun()
+
 # =========================
 # PREMIUM INPUT SECTION
 # =========================
@@ -689,6 +744,29 @@ with col_config3:
         help="Adjust the rewriting style"
     )
 
+grammar_level = st.radio(
+    "🩺 **Grammar Correction**",
+    ["none", "light", "aggressive"],
+    index=1,
+    horizontal=True,
+    help="none = fastest, light = capitalize sentences, aggressive = full sentence repair (slower)"
+)
+
+stream_output = st.checkbox(
+    "⚡ **Stream sentence by sentence**",
+    value=False,
+    disabled=not BACKEND_AVAILABLE,
+    help="Show each sentence as soon as it meets the similarity target - best for long documents"
+)
+
+document_mode = st.checkbox(
+    "📄 **Long document mode**",
+    value=False,
+    disabled=not BACKEND_AVAILABLE or stream_output,
+    help=f"Rewrite paragraphs in independent chunks on {DOCUMENT_WORKERS} worker process(es) "
+         f"and reassemble them in order"
+)
+
 # Action buttons
 col_btn1, col_btn2, col_btn3 = st.columns([2, 1, 1])
 
@@ -708,34 +786,73 @@ if col_btn1.button("🚀 **Start DNA Rewriting**", use_container_width=True):
         # Trigger bubble animation
         st.markdown(create_event_bubbles(25), unsafe_allow_html=True)
 
-        # Show enhanced progress and rewrite
-        with st.spinner("""
-        <div style="text-align: center; color: #00eaff;">
-            <div style="font-size: 1.2rem; margin-bottom: 0.5rem;">🧬 <strong>DNA Engine Processing</strong></div>
-            <div>Analyzing text structure • Loading synonyms • Applying transformations</div>
-        </div>
-        """):
-            progress_bar = st.progress(0)
+        if stream_output:
+            # Render sentences progressively as each one meets its target
             status_text = st.empty()
-
-            # Simulate processing steps
-            steps = [
-                "Initializing DNA algorithms...",
-                "Loading vocabulary database...", 
-                "Analyzing text structure...",
-                "Finding optimal synonyms...",
-                "Applying transformations...",
-                "Finalizing output..."
-            ]
-
-            for i, step in enumerate(steps):
-                progress = int((i + 1) / len(steps) * 100)
-                progress_bar.progress(progress)
-                status_text.text(f"🔄 {step}")
-                time.sleep(0.3)
-
-            # Perform actual rewriting
-            rewritten, similarity = guarantee_low_similarity(input_text, target_similarity, max_attempts)
+            live_box = st.empty()
+            chunks = []
+            started = time.perf_counter()
+            first_output_ms = None
+
+            for chunk in stream_rewrite(input_text, target_similarity, max_attempts, grammar=grammar_level):
+                chunks.append(chunk)
+                if first_output_ms is None:
+                    first_output_ms = (time.perf_counter() - started) * 1000
+                live_box.markdown(f"""
+                <div class="success-box">
+                    <h3 style="color:#00eaff; margin: 0 0 1rem 0;">⚡ Streaming Rewrite...</h3>
+                    <div style="color: #e6faff; font-size: 1.1rem; line-height: 1.7;">
+                        {join_chunks(chunks).replace(chr(10) * 2, '<br><br>')}
+                    </div>
+                </div>
+                """, unsafe_allow_html=True)
+                status_text.text(f"⚡ {len(chunks)} sentences • first output in {first_output_ms:.0f} ms")
+
+            rewritten = join_chunks(chunks)
+            similarity = calculate_similarity(input_text, rewritten)
+            live_box.empty()
+            status_text.text(f"✅ Streamed {len(chunks)} sentences in {time.perf_counter() - started:.2f}s "
+                             f"• first output in {first_output_ms or 0:.0f} ms")
+        else:
+            # Show enhanced progress and rewrite
+            with st.spinner("""
+            <div style="text-align: center; color: #00eaff;">
+                <div style="font-size: 1.2rem; margin-bottom: 0.5rem;">🧬 <strong>DNA Engine Processing</strong></div>
+                <div>Analyzing text structure • Loading synonyms • Applying transformations</div>
+            </div>
+            """):
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                last_update = [0.0]
+
+                def report_progress(event):
+                    """Drive the progress bar from real backend progress (throttled)"""
+                    now = time.perf_counter()
+                    if not event.finished and now - last_update[0] < 0.05:
+                        return
+                    last_update[0] = now
+                    progress_bar.progress(int(event.fraction * 100))
+                    best = "—" if event.best_similarity is None else f"{event.best_similarity:.1f}%"
+                    if event.finished:
+                        status_text.text(f"✅ Done • best similarity {best}")
+                    elif document_mode:
+                        status_text.text(f"📄 Chunk {event.sentences_done}/{event.sentences_total}")
+                    else:
+                        status_text.text(f"🔄 Attempt {event.attempt}/{event.max_attempts} • "
+                                         f"sentence {event.sentences_done}/{event.sentences_total} • "
+                                         f"best similarity {best}")
+
+                # Perform actual rewriting
+                started = time.perf_counter()
+                if document_mode:
+                    rewritten, similarity = rewrite_document(input_text, target_similarity, max_attempts,
+                                                             progress=report_progress, grammar=grammar_level)
+                else:
+                    rewritten, similarity = guarantee_low_similarity(input_text, target_similarity, max_attempts,
+                                                                     writing_style, progress=report_progress,
+                                                                     grammar=grammar_level)
+                progress_bar.progress(100)
+                status_text.text(f"✅ Done in {time.perf_counter() - started:.2f}s • similarity {similarity:.1f}%")
 
         # Display premium results
         st.markdown(f"""
@@ -757,7 +874,7 @@ if col_btn1.button("🚀 **Start DNA Rewriting**", use_container_width=True):
                        max-height: 400px;
                        overflow-y: auto;
                        box-shadow: inset 0 2px 10px rgba(0,0,0,0.3);">
-                {rewritten}
+                {rewritten.replace(chr(10) * 2, '<br><br>')}
             </div>
             <div style="margin-top: 1rem; display: flex; gap: 1rem; flex-wrap: wrap;">
                 <div style="background: rgba(0,100,255,0.2); padding: 0.5rem 1rem; border-radius: 15px; 
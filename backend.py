@@ -5,8 +5,35 @@
 import random
 import re
 import os
+import threading
+import time
 import ast
+import atexit
 import glob
+import heapq
+import itertools
+from typing import NamedTuple
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from grammar_pipeline import DEFAULT_GRAMMAR, GRAMMAR_LEVELS, get_pipeline, grammar_stats, render_sentences
+from near_duplicates import NearDuplicateIndex
+from phrase_matcher import PhraseMatcher
+from result_cache import ResultCache, cache_key
+from similarity import SimilarityScorer
+from term_filter import TermFilter, bernoulli_draws
+from tokenizer import PUNCT, TERM_PATTERN, WORD, Token, render_tokens, terms_of, tokenize
+from vector_similarity import SIMILARITY_METRICS, TermIds, VectorScorer
+import instrumentation
+import vocab_shards
+import vocab_snapshot
+
+# How vocabulary is loaded (REWRITER_VOCAB_MODE):
+#   snapshot - memory-map the precompiled snapshot (default)
+#   lazy     - parse alphabetical shards on first lookup, LRU-evicted
+#   eager    - parse every source file up front
+VOCAB_MODES = ('snapshot', 'lazy', 'eager')
+VOCAB_MODE = os.environ.get('REWRITER_VOCAB_MODE', 'snapshot')
 
 print("🚀 INITIALIZING EXTREME REWRITER BACKEND...")
 
@@ -14,10 +41,15 @@ print("🚀 INITIALIZING EXTREME REWRITER BACKEND...")
 # VOCABULARY LOADER (PROVEN WORKING)
 # =========================
 class VocabularyLoader:
-    def __init__(self):
+    def __init__(self, mode=VOCAB_MODE):
+        if mode not in VOCAB_MODES:
+            raise ValueError(f"Unknown vocabulary mode {mode!r}, expected one of {VOCAB_MODES}")
         self.all_synonyms = {}
         self.total_words = 0
         self.loaded_files_count = 0
+        self.mode = mode
+        self.snapshot_version = None
+        self.fingerprint = None
         self.load_all_vocabulary()
 
     def load_all_vocabulary(self):
@@ -26,13 +58,21 @@ class VocabularyLoader:
         print("📚 LOADING VOCABULARY DATABASE...")
         print("="*70)
 
-        # Start with guaranteed base vocabulary
-        self._load_base_vocabulary()
+        if self.mode == 'lazy':
+            self._load_lazy_shards()
+        elif not (self.mode == 'snapshot' and self._load_snapshot()):
+            # Start with guaranteed base vocabulary
+            self._load_base_vocabulary()
+
+            # Load synonym files
+            self._load_synonym_files()
 
-        # Load synonym files
-        self._load_synonym_files()
+            # Same candidate tuples the snapshot stores
+            self.all_synonyms = vocab_snapshot.compile_candidates(self.all_synonyms)
 
         self.total_words = len(self.all_synonyms)
+        if self.fingerprint is None:
+            self.fingerprint = vocab_snapshot.manifest_fingerprint(vocab_snapshot.build_manifest())
 
         print("="*70)
         print("🎉 VOCABULARY LOADING COMPLETE!")
@@ -41,11 +81,38 @@ class VocabularyLoader:
         print(f"✅ FILES LOADED: {self.loaded_files_count}")
 
         if self.total_words > 0:
-            sample_words = list(self.all_synonyms.keys())[:5]
+            sample_words = list(itertools.islice(self.all_synonyms, 5))
             print(f"🔍 SAMPLE WORDS: {', '.join(sample_words)}")
 
         return self.total_words, self.all_synonyms
 
+    def _load_snapshot(self):
+        """Load the precompiled snapshot, rebuilding it if any source changed"""
+        try:
+            header, vocabulary = vocab_snapshot.load_snapshot()
+        except Exception as e:
+            print(f"❌ Vocabulary snapshot unavailable: {str(e)}")
+            return False
+
+        # Memory-mapped SynonymStore - shared between worker processes
+        self.all_synonyms = vocabulary
+        self.loaded_files_count = header['loaded_files']
+        self.snapshot_version = header['version']
+        self.fingerprint = vocab_snapshot.manifest_fingerprint(header['manifest'])
+        print(f"✅ Snapshot v{header['version']}: {len(header['manifest'])} sources, "
+              f"{header['unique_strings']:,} interned strings")
+        return True
+
+    def _load_lazy_shards(self):
+        """Load base vocabulary now and index synonym shards for on-demand loading"""
+        self._load_base_vocabulary()
+        base_vocabulary = vocab_snapshot.compile_candidates(self.all_synonyms)
+
+        self.all_synonyms = vocab_shards.LazyShardedVocabulary(base_vocabulary)
+        self.loaded_files_count = len(self.all_synonyms.shards)
+        print(f"🔍 Indexed {self.loaded_files_count} synonym shards (lazy, "
+              f"{self.all_synonyms.budget_bytes // (1024 * 1024)} MB budget)")
+
     def _load_base_vocabulary(self):
         """Load base vocabulary files"""
         try:
@@ -100,41 +167,7 @@ class VocabularyLoader:
 
     def _simple_parse_synonyms(self, content):
         """Simple parser that ACTUALLY WORKS"""
-        synonyms = {}
-        lines = content.split('\n')
-        in_synonyms = False
-
-        for line in lines:
-            line = line.strip()
-
-            if not line or line.startswith('#'):
-                continue
-
-            if 'synonyms = {' in line:
-                in_synonyms = True
-                continue
-
-            if in_synonyms and '}' in line:
-                break
-
-            if in_synonyms and ':' in line:
-                # Simple key-value extraction
-                parts = line.split(':', 1)
-                if len(parts) == 2:
-                    key = parts[0].strip().strip('"\'')
-                    value_str = parts[1].strip().rstrip(',')
-
-                    if value_str.startswith('[') and value_str.endswith(']'):
-                        # List value
-                        items = value_str[1:-1].split(',')
-                        values = [item.strip().strip('"\'') for item in items if item.strip()]
-                        synonyms[key] = values
-                    else:
-                        # String value  
-                        value = value_str.strip('"\'')
-                        synonyms[key] = value
-
-        return synonyms
+        return vocab_snapshot.parse_synonym_source(content)
 
     def get_vocabulary_stats(self):
         """Get vocabulary statistics"""
@@ -143,20 +176,17 @@ class VocabularyLoader:
             "loaded_files": self.loaded_files_count,
             "health_terms": 2500,  # Placeholder
             "general_words": 1200,  # Placeholder
-            "vocabulary_loaded": self.total_words > 0
+            "vocabulary_loaded": self.total_words > 0,
+            "vocabulary_mode": self.mode,
+            "snapshot_version": self.snapshot_version,
+            "vocabulary_fingerprint": self.fingerprint
         }
 
-# =========================
-# INITIALIZE VOCABULARY
-# =========================
-print("🔄 Initializing vocabulary loader...")
-vocabulary_loader = VocabularyLoader()
-
 # =========================
 # TEXT PROCESSING
 # =========================
 def simple_tokenize(text):
-    words = re.findall(r'\b\w+\b', text.lower())
+    words = TERM_PATTERN.findall(text.lower())
     return words
 
 def correct_grammar(text):
@@ -164,18 +194,7 @@ def correct_grammar(text):
     if not text:
         return text
 
-    sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
-    corrected = []
-
-    for sentence in sentences:
-        if sentence:
-            corrected.append(sentence[0].upper() + sentence[1:])
-
-    result = '. '.join(corrected)
-    if result and result[-1] not in '.!?':
-        result += '.'
-
-    return result
+    return render_sentences(tokenize(text).sentences())
 
 # =========================
 # SYNONYM FINDER
@@ -183,140 +202,853 @@ def correct_grammar(text):
 class SynonymFinder:
     def __init__(self, vocabulary):
         self.vocabulary = vocabulary
+        # SynonymStore decodes only the picked candidate
+        self._choose = getattr(vocabulary, 'choose', None)
 
     def get_synonyms(self, word):
         word = word.lower().strip()
+        return list(self.get_candidates(word))
 
-        if word in self.vocabulary:
-            synonyms = self.vocabulary[word]
-            if isinstance(synonyms, str):
-                return [synonyms]
-            elif isinstance(synonyms, list):
-                return synonyms
-            return [str(synonyms)]
+    def get_candidates(self, word):
+        """Candidate tuple for a lowercase headword (filtered at load time)"""
+        return self.vocabulary.get(word) or ()
 
-        return []
+    def choose(self, word, rng=random):
+        """One random candidate for a lowercase headword, or None"""
+        if self._choose is not None:
+            return self._choose(word, rng)
+        candidates = self.vocabulary.get(word)
+        return candidates[rng.randrange(len(candidates))] if candidates else None
 
 # =========================
 # REWRITER
 # =========================
+MOREOVER_TOKENS = [Token('Moreover', 'moreover', WORD, capitalized=True, space_before=True),
+                   Token(',', ',', PUNCT, space_before=False)]
+
 class PureRewriter:
-    def __init__(self):
+    def __init__(self, vocabulary_loader, term_filter=None):
         self.synonym_finder = SynonymFinder(vocabulary_loader.all_synonyms)
+        self.term_filter = term_filter or TermFilter.from_env()
         self.vocabulary = vocabulary_loader.all_synonyms
         self.stats = vocabulary_loader.get_vocabulary_stats()
-
-        print(f"🎯 REWRITER INITIALIZED WITH {len(self.vocabulary):,} WORDS")
-
-    def intelligent_word_replacement(self, text):
-        words = text.split()
-        new_words = []
-
-        for word in words:
-            clean_word = word.lower().strip('.,!?;:"')
-
-            # Skip common words
-            skip_words = {'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to'}
-            if len(clean_word) <= 2 or clean_word in skip_words:
-                new_words.append(word)
+        self.phrase_matcher = PhraseMatcher(self.vocabulary)
+        # identifies everything besides the request that shapes the output
+        self.fingerprint = f'{vocabulary_loader.fingerprint}-{self.term_filter.fingerprint()}'
+
+        print(f"🎯 REWRITER INITIALIZED WITH {len(self.vocabulary):,} WORDS "
+              f"({self.phrase_matcher.phrase_count:,} PHRASES)")
+
+    def replace_tokens(self, tokens, rng=random):
+        """Word and phrase replacement over a token list; punctuation is kept in place"""
+        lowers = [token.lower for token in tokens]
+        finder = self.synonym_finder
+        term_filter = self.term_filter
+        protected = term_filter.protected_mask(lowers)
+
+        # Multi-word headwords are replaced as a unit and hide the words they cover
+        phrases = []
+        covered = bytearray(len(tokens))
+        for start, end in self.phrase_matcher.find_matches(lowers):
+            if any(protected[start:end]) or not term_filter.allows_phrase(lowers[start:end]):
                 continue
+            candidates = finder.get_candidates(' '.join(lowers[start:end]))
+            if candidates:
+                phrases.append((start, end, candidates))
+                covered[start:end] = b'\x01' * (end - start)
+
+        words = [i for i in term_filter.eligible(tokens, protected) if not covered[i]]
+
+        # One batched draw for the whole text instead of one per token
+        draws = bernoulli_draws(rng, len(phrases) + len(words), 0.7)
+        new_tokens = list(tokens)
+        replaced = 0
+
+        for i, hit in zip(words, draws[len(phrases):]):
+            if hit:
+                replacement = finder.choose(lowers[i], rng)
+                if replacement:
+                    token = tokens[i]
+                    new_tokens[i] = token.replaced(replacement.capitalize() if token.capitalized else replacement)
+                    replaced += 1
+
+        # right-to-left so earlier phrase spans keep their indexes
+        for (start, end, candidates), hit in reversed(list(zip(phrases, draws))):
+            if hit:
+                token = tokens[start]
+                replacement = rng.choice(candidates)
+                new_tokens[start:end] = [token.replaced(replacement.capitalize() if token.capitalized else replacement)]
+                replaced += 1
+
+        instrumentation.count('replacements', replaced)
+        instrumentation.count('eligible_units', len(phrases) + len(words))
+        return new_tokens
+
+    def intelligent_word_replacement(self, text, rng=random):
+        return render_tokens(self.replace_tokens(tokenize(text).tokens, rng))
+
+    def restructure_sentences(self, sentences, rng=random):
+        """Shuffle token sentences and join some of them with a connective"""
+        if len(sentences) <= 1:
+            return sentences
+
+        sentences = list(sentences)
+        if rng.random() < 0.6:
+            rng.shuffle(sentences)
+
+        result = [sentences[0]]
+        for sentence in sentences[1:]:
+            if rng.random() < 0.4:
+                first = sentence[0]
+                first = first._replace(text=first.lower, capitalized=False, space_before=True)
+                result.append(MOREOVER_TOKENS + [first] + sentence[1:])
+            else:
+                result.append(sentence)
 
-            # Try replacement
-            if random.random() < 0.7:
-                synonyms = self.synonym_finder.get_synonyms(clean_word)
-                if synonyms:
-                    valid_synonyms = [s for s in synonyms if s.lower() != clean_word]
-                    if valid_synonyms:
-                        replacement = random.choice(valid_synonyms)
-                        if word[0].isupper():
-                            replacement = replacement.capitalize()
-                        new_words.append(replacement)
-                        continue
-
-            new_words.append(word)
-
-        return ' '.join(new_words)
+        return result
 
-    def varied_sentence_restructure(self, text):
-        sentences = [s.strip() for s in re.split(r'[.!?]+', text) if s.strip()]
+    def varied_sentence_restructure(self, text, rng=random):
+        sentences = tokenize(text).sentences()
 
         if len(sentences) <= 1:
             return text
 
-        if random.random() < 0.6:
-            random.shuffle(sentences)
+        return render_sentences(self.restructure_sentences(sentences, rng))
+
+    def _search_units(self, sentences):
+        """Replaceable spans grouped by headword: {key: (valid synonyms, [(sentence, start, end)])}"""
+        units = {}
+        term_filter = self.term_filter
+
+        for index, tokens in enumerate(sentences):
+            lowers = [token.lower for token in tokens]
+            protected = term_filter.protected_mask(lowers)
+            eligible = term_filter.eligible_mask(tokens, protected)
+            phrase_ends = {start: end for start, end in self.phrase_matcher.find_matches(lowers)
+                           if not any(protected[start:end]) and term_filter.allows_phrase(lowers[start:end])}
+            i = 0
+            while i < len(tokens):
+                end = phrase_ends.get(i)
+                if end:
+                    key = ' '.join(lowers[i:end])
+                else:
+                    end = i + 1
+                    key = lowers[i]
+                    if not eligible[i]:
+                        i = end
+                        continue
 
-        result = sentences[0] + '. '
-        for i in range(1, len(sentences)):
-            if random.random() < 0.4:
-                result += '. Moreover, ' + sentences[i].lower()
-            else:
-                result += sentences[i] + '. '
+                if key not in units:
+                    units[key] = (self.synonym_finder.get_candidates(key), [])
+                if units[key][0]:
+                    units[key][1].append((index, i, end))
+                    i = end
+                elif end - i > 1:
+                    # phrase without usable synonyms - fall back to its words
+                    phrase_ends.pop(i)
+                else:
+                    i = end
+
+        return {key: unit for key, unit in units.items() if unit[0]}
+
+    def targeted_replacement(self, sentences, original_terms, max_similarity, meets_target=None):
+        """Greedy search for the replacements that cut similarity the most.
+
+        Each headword is scored by how many original terms disappear from the
+        output when all its occurrences are replaced by its least-overlapping
+        synonym, minus the original terms that synonym brings in. Headwords are
+        applied best-first (lazy max-heap) until max_similarity is reached or
+        no replacement lowers similarity any further. Stored gains can be out
+        of date in either direction, so every popped entry is re-evaluated.
+
+        meets_target, if given, is called with rewritten sentences and decides
+        when to stop once term overlap is within max_similarity (for other
+        metrics). Replacements that leave overlap unchanged are then applied
+        too, and the check runs after 1, 2, 4, ... further replacements so
+        long texts are not rebuilt after every one.
+        """
+        counts = Counter()
+        for tokens in sentences:
+            for token in tokens:
+                if token.is_word:
+                    counts.update(TERM_PATTERN.findall(token.lower))
+
+        units = self._search_units(sentences)
+        plans = {}
+        for key, (synonyms, spans) in units.items():
+            # fewest original terms introduced wins; list order breaks ties
+            synonym = min(synonyms, key=lambda s: len(terms_of(s) & original_terms))
+            removed = Counter({term: n * len(spans) for term, n in Counter(TERM_PATTERN.findall(key)).items()})
+            added = Counter({term: n * len(spans) for term, n in Counter(TERM_PATTERN.findall(synonym.lower())).items()})
+            plans[key] = (synonym, removed, added)
+
+        def gain(key):
+            _, removed, added = plans[key]
+            dropped = sum(1 for term, n in removed.items()
+                          if term in original_terms and counts[term] and counts[term] - n + added[term] <= 0)
+            introduced = sum(1 for term in added
+                             if term in original_terms and not counts[term] and term not in removed)
+            return dropped - introduced
+
+        matched = sum(1 for term in original_terms if counts[term])
+        target = max_similarity / 100 * len(original_terms)
+        chosen = {}
+        # a neutral replacement can still lower another metric
+        min_gain = 0 if meets_target is not None else 1
+        check_after = applied_since_check = 0
+
+        heap = [(-gain(key), order, key) for order, key in enumerate(plans)]
+        heapq.heapify(heap)
+        while heap:
+            if matched <= target and applied_since_check >= check_after:
+                if meets_target is None or meets_target(self._apply_units(sentences, units, chosen)):
+                    break
+                check_after, applied_since_check = max(1, 2 * check_after), 0
+
+            _, order, key = heapq.heappop(heap)
+            current = gain(key)
+            if heap and current < -heap[0][0]:
+                heapq.heappush(heap, (-current, order, key))
+                continue
+            if current < min_gain:
+                # gains can rise again as other units apply, so later entries still get re-evaluated
+                continue
 
-        return result.strip()
+            synonym, removed, added = plans[key]
+            counts.subtract(removed)
+            counts.update(added)
+            matched = sum(1 for term in original_terms if counts[term] > 0)
+            chosen[key] = synonym
+            applied_since_check += 1
+
+        return self._apply_units(sentences, units, chosen)
+
+    @staticmethod
+    def _apply_units(sentences, units, chosen):
+        """Copy of sentences with every span of the chosen headwords replaced"""
+        rewritten = [list(tokens) for tokens in sentences]
+        # replace right-to-left so earlier spans keep their indexes
+        spans = sorted(((index, start, end, key) for key in chosen for index, start, end in units[key][1]),
+                       reverse=True)
+        for index, start, end, key in spans:
+            token = rewritten[index][start]
+            replacement = chosen[key].capitalize() if token.capitalized else chosen[key]
+            rewritten[index][start:end] = [token.replaced(replacement)]
+        return rewritten
 
     def get_vocabulary_info(self):
         return self.stats
 
 # =========================
-# INITIALIZE REWRITER
+# INITIALIZE REWRITER (LAZY, ONCE PER PROCESS)
 # =========================
-print("🔄 Initializing rewriter...")
-pure_rewriter = PureRewriter()
+vocabulary_loader = None
+pure_rewriter = None
+_backend_lock = threading.Lock()
+_backend_info = {"loaded_at": None, "load_seconds": None, "vocabulary_seconds": None, "reloads": 0}
+
+def _build_backend(mode):
+    global vocabulary_loader, pure_rewriter
+    started = time.perf_counter()
+
+    print("🔄 Initializing vocabulary loader...")
+    loader = VocabularyLoader(mode)
+    vocabulary_seconds = time.perf_counter() - started
+    print("🔄 Initializing rewriter...")
+    rewriter = PureRewriter(loader)
+
+    vocabulary_loader, pure_rewriter = loader, rewriter
+    _backend_info["loaded_at"] = time.time()
+    _backend_info["vocabulary_seconds"] = vocabulary_seconds
+    _backend_info["load_seconds"] = time.perf_counter() - started
+    return rewriter
+
+def get_rewriter():
+    """The process-wide PureRewriter, built on first use"""
+    rewriter = pure_rewriter
+    if rewriter is None:
+        with _backend_lock, instrumentation.stage('load'):
+            rewriter = pure_rewriter or _build_backend(VOCAB_MODE)
+    return rewriter
+
+def reload_backend(mode=None):
+    """Rebuild vocabulary and rewriter, e.g. after vocabulary files changed"""
+    global _term_ids
+    with _backend_lock:
+        rewriter = _build_backend(mode or (vocabulary_loader.mode if vocabulary_loader else VOCAB_MODE))
+        _backend_info["reloads"] += 1
+    get_result_cache().clear()
+    _term_ids = None
+    # Pool workers hold the old vocabulary; the next parallel call forks fresh ones
+    shutdown_process_pool()
+    return rewriter
+
+def backend_health():
+    """Introspection for dashboards: load state, timings and vocabulary stats"""
+    loaded = pure_rewriter is not None
+    health = {
+        "loaded": loaded,
+        "pid": os.getpid(),
+        **_backend_info,
+        "process_pool_workers": _process_pool_workers if _process_pool is not None else 0,
+    }
+    if loaded:
+        health.update(vocabulary_loader.get_vocabulary_stats())
+        health["phrases"] = pure_rewriter.phrase_matcher.phrase_count
+        health["term_filter"] = pure_rewriter.term_filter.stats()
+        if vocabulary_loader.mode == 'lazy':
+            health["shards"] = vocabulary_loader.all_synonyms.shard_stats()
+    health["grammar"] = grammar_stats()
+    if _term_ids is not None:
+        health["term_ids"] = _term_ids.stats()
+    if _reference_index is not None:
+        health["reference_index"] = _reference_index.index_stats()
+    health["result_cache"] = get_result_cache().cache_stats()
+    health["metrics"] = instrumentation.metrics_snapshot()
+    return health
 
 # =========================
 # CORE FUNCTIONS
 # =========================
-def extreme_rewriter(original_text):
+REWRITE_STRATEGIES = ('random', 'search')
+
+# Worker processes for guarantee_low_similarity attempts (1 = run sequentially)
+DEFAULT_WORKERS = int(os.environ.get('REWRITER_WORKERS', '1'))
+
+# Near-duplicate index of published documents every rewrite is also checked against
+REFERENCE_INDEX_PATH = os.environ.get('REWRITER_REFERENCE_INDEX') or None
+
+_result_cache = None
+_term_ids = None
+_reference_index = None
+
+def get_term_ids():
+    """Process-wide TermIds over the loaded vocabulary, replaced once it fills up"""
+    global _term_ids
+    if _term_ids is None or _term_ids.full:
+        _term_ids = TermIds(get_rewriter().vocabulary)
+    return _term_ids
+
+def metric_scorer(original, metric, scorer=None):
+    """Scorer for a similarity metric; 'overlap' reuses the set-based SimilarityScorer"""
+    if metric == 'overlap':
+        return scorer or SimilarityScorer(original)
+    return VectorScorer(original, metric, get_term_ids())
+
+def get_reference_index():
+    """NearDuplicateIndex at REWRITER_REFERENCE_INDEX, or None when unset"""
+    global _reference_index
+    if _reference_index is None and REFERENCE_INDEX_PATH:
+        _reference_index = NearDuplicateIndex(REFERENCE_INDEX_PATH)
+    return _reference_index
+
+def clears_reference(rewritten, reference_index):
+    """True unless an indexed document is at least as similar as the index threshold"""
+    if reference_index is None:
+        return True
+    with instrumentation.stage('reference'):
+        matches = reference_index.query(rewritten, limit=1)
+    if matches:
+        instrumentation.count('reference_rejections')
+        return False
+    return True
+
+def get_result_cache():
+    """Process-wide ResultCache configured from REWRITER_CACHE_* variables"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache()
+    return _result_cache
+
+class RewriteProgress(NamedTuple):
+    """Progress of a guarantee_low_similarity call, passed to progress callbacks"""
+    attempt: int
+    max_attempts: int
+    sentences_done: int
+    sentences_total: int
+    best_similarity: float = None
+    finished: bool = False
+
+    @property
+    def fraction(self):
+        if self.finished:
+            return 1.0
+        sentences = self.sentences_done / self.sentences_total if self.sentences_total else 1
+        return min(1.0, (self.attempt - 1 + sentences) / max(1, self.max_attempts))
+
+def rewrite_stream(stream, tracker=None, on_sentence=None, rng=None):
+    """Restructure and replace over a TokenStream; returns token sentences.
+
+    With a SimilarityTracker the attempt is abandoned (None is returned) as soon
+    as its similarity can no longer beat the tracker's limit. on_sentence is
+    called with (sentences done, sentences total) after each sentence. rng is
+    the random.Random driving this attempt (a fresh unseeded one by default).
+    """
+    rng = rng or random.Random()
+    rewriter = get_rewriter()
+    with instrumentation.stage('restructure'):
+        sentences = rewriter.restructure_sentences(stream.sentences(), rng)
+    rewritten = []
+    for sentence in sentences:
+        instrumentation.count('tokens', len(sentence))
+        with instrumentation.stage('replace'):
+            sentence = rewriter.replace_tokens(sentence, rng)
+        if tracker is not None:
+            with instrumentation.stage('similarity'):
+                tracker.add_tokens(sentence)
+            if tracker.exhausted:
+                return None
+        rewritten.append(sentence)
+        if on_sentence is not None:
+            on_sentence(len(rewritten), len(sentences))
+    return rewritten
+
+def extreme_rewriter(original_text, seed=None, grammar=None):
+    """One random rewrite, corrected at the given grammar level (DEFAULT_GRAMMAR when None)"""
     if not original_text:
         return original_text
 
-    clean_text = original_text.strip()
-
-    # Apply transformations
-    result = clean_text
-    result = pure_rewriter.varied_sentence_restructure(result)
-    result = pure_rewriter.intelligent_word_replacement(result)
-
-    # Grammar correction
-    result = correct_grammar(result)
-
-    return result
-
-def calculate_similarity(original, rewritten):
+    pipeline = get_pipeline(grammar)
+    with instrumentation.trace_request('extreme_rewriter', grammar=pipeline.name):
+        with instrumentation.stage('tokenize'):
+            stream = tokenize(original_text.strip())
+
+        # Apply transformations, then grammar correction
+        sentences = rewrite_stream(stream, rng=random.Random(seed))
+        with instrumentation.stage('grammar'):
+            return pipeline.render(sentences)
+
+def finish_attempt(sentences, pipeline, similarity, scorer):
+    """Render an attempt's sentences; score them unless similarity is already known.
+
+    Pipelines that may change words are always re-scored on the rendered text.
+    """
+    with instrumentation.stage('grammar'):
+        rewritten = pipeline.render(sentences)
+    if pipeline.rescore or similarity is None:
+        with instrumentation.stage('similarity'):
+            similarity = scorer.score(rewritten) if pipeline.rescore else scorer.score_sentences(sentences)
+    return rewritten, similarity
+
+def attempt_seeds(seed, count):
+    """Per-attempt seeds derived from one call seed (None when unseeded)"""
+    if seed is None:
+        return [None] * count
+    rng = random.Random(seed)
+    return [rng.getrandbits(64) for _ in range(count)]
+
+def calculate_similarity(original, rewritten, metric='overlap'):
+    """Similarity percentage of rewritten to original under one of SIMILARITY_METRICS"""
     if not original or not rewritten:
         return 0
 
-    original_words = set(simple_tokenize(original))
-    rewritten_words = set(simple_tokenize(rewritten))
-
-    if not original_words:
-        return 0
-
-    common_words = original_words.intersection(rewritten_words)
-    similarity = len(common_words) / len(original_words) * 100
+    return metric_scorer(original, metric).score(rewritten)
+
+def search_rewriter(stream, scorer, max_similarity, pipeline=None, final_scorer=None):
+    """Single deterministic pass: targeted replacements, no sentence shuffling.
+
+    Replacements are ranked by term overlap; with a final_scorer for another
+    metric, replacements continue until that metric is within max_similarity
+    too (or none are left), and it scores the result.
+    """
+    pipeline = pipeline or get_pipeline()
+    rewriter = get_rewriter()
+    meets_target = None
+    if final_scorer is not None and final_scorer is not scorer:
+        meets_target = lambda sentences: final_scorer.score_sentences(sentences) <= max_similarity
+    with instrumentation.stage('search'):
+        sentences = rewriter.targeted_replacement(stream.sentences(), scorer.original_terms, max_similarity,
+                                                  meets_target)
+    if final_scorer is not None and final_scorer is not scorer:
+        return finish_attempt(sentences, pipeline, None, final_scorer)
+    tracker = scorer.tracker()
+    with instrumentation.stage('similarity'):
+        for sentence in sentences:
+            tracker.add_tokens(sentence)
+    return finish_attempt(sentences, pipeline, tracker.similarity, scorer)
 
-    return similarity
+# =========================
+# PARALLEL ATTEMPTS
+# =========================
+_process_pool = None
+_process_pool_workers = 0
+
+def get_process_pool(workers):
+    """Shared process pool, created on first use and resized on demand"""
+    global _process_pool, _process_pool_workers
+    if _process_pool is None or _process_pool_workers != workers:
+        # Load vocabulary first so forked workers inherit it
+        get_rewriter()
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = ProcessPoolExecutor(max_workers=workers)
+        _process_pool_workers = workers
+    return _process_pool
+
+@atexit.register
+def shutdown_process_pool():
+    global _process_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+def _seeded_attempt(original_text, seed, grammar, metric='overlap'):
+    """One random attempt in a worker process, with its own seed"""
+    stream = tokenize(original_text.strip())
+    sentences = rewrite_stream(stream, rng=random.Random(seed))
+    scorer = metric_scorer(stream, metric)
+    similarity = None
+    if metric == 'overlap':
+        tracker = scorer.tracker()
+        for sentence in sentences:
+            tracker.add_tokens(sentence)
+        similarity = tracker.similarity
+    return finish_attempt(sentences, get_pipeline(grammar), similarity, scorer)
+
+def parallel_attempts(original_text, max_similarity, max_attempts, workers, progress=None, seed=None,
+                      grammar=None, metric='overlap', reference_index=None):
+    """Fan attempts out over the pool; the first one meeting the target cancels the rest.
+
+    Seeded calls take results in attempt order, so they return exactly what the
+    sequential loop would; unseeded calls take whichever attempt finishes first.
+    """
+    pool = get_process_pool(workers)
+    futures = [pool.submit(_seeded_attempt, original_text, attempt_seed, grammar, metric)
+               for attempt_seed in attempt_seeds(seed, max_attempts)]
 
-def guarantee_low_similarity(original_text, max_similarity=20, max_attempts=5):
     best_result = None
     best_similarity = 100
+    best_clear = False
+    started = time.perf_counter()
+    trace = instrumentation.current_trace()
+    try:
+        for completed, future in enumerate(futures if seed is not None else as_completed(futures), 1):
+            rewritten, similarity = future.result()
+            if trace is not None:
+                # wall time until this attempt's result arrived
+                trace.attempt(completed, time.perf_counter() - started, similarity)
+
+            clear = clears_reference(rewritten, reference_index)
+            if best_result is None or (clear, -similarity) > (best_clear, -best_similarity):
+                best_result = rewritten
+                best_similarity = similarity
+                best_clear = clear
+
+            if progress is not None:
+                progress(RewriteProgress(completed, max_attempts, 1, 1, best_similarity))
+
+            if clear and similarity <= max_similarity:
+                break
+    finally:
+        for future in futures:
+            future.cancel()
 
-    for attempt in range(max_attempts):
-        rewritten = extreme_rewriter(original_text)
-        similarity = calculate_similarity(original_text, rewritten)
+    return best_result, best_similarity
+
+def guarantee_low_similarity(original_text, max_similarity=20, max_attempts=5, strategy='random',
+                             workers=DEFAULT_WORKERS, progress=None, seed=None, use_cache=True, grammar=None,
+                             metric='overlap', reference_index=None):
+    """Rewrite until similarity <= max_similarity.
+
+    strategy='random' retries extreme_rewriter up to max_attempts times and keeps
+    the best attempt; strategy='search' ranks replacements by how much overlap
+    they remove and reaches the target in one deterministic pass. With
+    workers > 1 random attempts run concurrently on a process pool.
+
+    progress, if given, is called with a RewriteProgress after every sentence
+    (every attempt when parallel) and once more when the call finishes.
+
+    The same text, settings and seed always give the same result, whatever
+    the number of workers; seed=None draws fresh randomness per call.
+
+    grammar picks the correction level ('none', 'light', 'aggressive';
+    DEFAULT_GRAMMAR when None). Levels that may drop words are re-scored on
+    the corrected text, so the returned similarity always describes it.
+
+    metric picks what max_similarity is measured in (SIMILARITY_METRICS:
+    'overlap' is calculate_similarity's term overlap, the others are the
+    vectorized metrics of vector_similarity).
+
+    With a reference index (reference_index, or REWRITER_REFERENCE_INDEX by
+    default) an attempt only meets the target when it is also not a near
+    duplicate of any indexed document; attempts that clear the index are
+    preferred over ones that do not, whatever their similarity.
+
+    Results are served from the result cache when the same normalised text,
+    settings and seed were rewritten before by the same engine. Only
+    reproducible calls (a seed, or strategy='search') that met the target are
+    cached, so unseeded calls and retries after a miss still draw new attempts.
+    """
+    if strategy not in REWRITE_STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {REWRITE_STRATEGIES}")
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"Unknown similarity metric {metric!r}, expected one of {SIMILARITY_METRICS}")
+    pipeline = get_pipeline(grammar)
+    if reference_index is None:
+        reference_index = get_reference_index()
+    if not original_text:
+        return original_text, 0
+
+    with instrumentation.trace_request('guarantee_low_similarity', strategy=strategy, workers=workers,
+                                       grammar=pipeline.name, metric=metric, characters=len(original_text)):
+        cache = get_result_cache() if use_cache else None
+        key = None
+        if cache is not None and cache.enabled and (seed is not None or strategy == 'search'):
+            fingerprint = get_rewriter().fingerprint
+            if reference_index is not None:
+                fingerprint += f'|{reference_index.fingerprint()}'
+            key = cache_key(original_text, max_similarity, max_attempts, strategy, seed, fingerprint,
+                            pipeline.name, metric)
+            result = cache.get(key)
+            instrumentation.count('cache_hits' if result is not None else 'cache_misses')
+            if result is not None:
+                if progress is not None:
+                    progress(RewriteProgress(max_attempts, max_attempts, 1, 1, result[1], finished=True))
+                return result
+
+        result = _guarantee_low_similarity(original_text, max_similarity, max_attempts, strategy, workers,
+                                           progress, seed, pipeline, metric, reference_index)
+        if key is not None and result[1] <= max_similarity and (
+                reference_index is None or not reference_index.query(result[0], limit=1)):
+            cache.put(key, result)
+        if progress is not None:
+            progress(RewriteProgress(max_attempts, max_attempts, 1, 1, result[1], finished=True))
+        return result
+
+def _guarantee_low_similarity(original_text, max_similarity, max_attempts, strategy, workers, progress, seed,
+                              pipeline, metric, reference_index):
+    # Tokenize and score the original once; every attempt reuses both
+    with instrumentation.stage('tokenize'):
+        stream = tokenize(original_text.strip())
+        scorer = SimilarityScorer(stream)
+        final_scorer = metric_scorer(stream, metric, scorer)
+
+    if strategy == 'search':
+        result = search_rewriter(stream, scorer, max_similarity, pipeline, final_scorer)
+        # one deterministic pass: nothing to retry, the check is only recorded
+        clears_reference(result[0], reference_index)
+        return result
+
+    if workers and workers > 1 and max_attempts > 1:
+        return parallel_attempts(original_text, max_similarity, max_attempts, workers, progress, seed,
+                                 pipeline.name, metric, reference_index)
 
-        if similarity < best_similarity:
+    best_result = None
+    best_similarity = 100
+    best_clear = False   # whether best_result also clears the reference index
+
+    for attempt, attempt_seed in enumerate(attempt_seeds(seed, max_attempts), 1):
+        on_sentence = None
+        if progress is not None:
+            best = best_similarity if best_result is not None else None
+            on_sentence = lambda done, total, attempt=attempt, best=best: progress(
+                RewriteProgress(attempt, max_attempts, done, total, best))
+
+        # Once there is a best result, give up on attempts that cannot beat it
+        # (not when correction re-scores: the token score is not the final one,
+        # nor while the best result fails the reference index).
+        # Only term overlap is tracked incrementally; other metrics score whole attempts.
+        tracker = None
+        if metric == 'overlap':
+            abandon = best_result is not None and best_clear and not pipeline.rescore
+            tracker = scorer.tracker(limit=best_similarity if abandon else None)
+        started = time.perf_counter()
+        sentences = rewrite_stream(stream, tracker, on_sentence, random.Random(attempt_seed))
+        trace = instrumentation.current_trace()
+        if sentences is None:
+            if trace is not None:
+                trace.attempt(attempt, time.perf_counter() - started, tracker.similarity, abandoned=True)
+            continue
+
+        rewritten, similarity = finish_attempt(sentences, pipeline, tracker and tracker.similarity, final_scorer)
+        if trace is not None:
+            trace.attempt(attempt, time.perf_counter() - started, similarity)
+
+        clear = clears_reference(rewritten, reference_index)
+        if best_result is None or (clear, -similarity) > (best_clear, -best_similarity):
             best_result = rewritten
             best_similarity = similarity
+            best_clear = clear
 
-        if similarity <= max_similarity:
+        if clear and similarity <= max_similarity:
             return rewritten, similarity
 
     return best_result, best_similarity
 
+# =========================
+# BATCH PROCESSING
+# =========================
+class RewriteResult(NamedTuple):
+    index: int
+    original: str
+    rewritten: str
+    similarity: float
+
+def _batch_chunk(start, texts, max_similarity, max_attempts, strategy, seeds, grammar=None, metric='overlap',
+                 use_cache=True):
+    """A chunk of batch items in a worker process"""
+    results = []
+    for offset, (text, seed) in enumerate(zip(texts, seeds)):
+        rewritten, similarity = guarantee_low_similarity(text, max_similarity, max_attempts, strategy,
+                                                         workers=1, seed=seed, use_cache=use_cache,
+                                                         grammar=grammar, metric=metric)
+        results.append(RewriteResult(start + offset, text, rewritten, similarity))
+    return results
+
+def rewrite_batch(texts, max_similarity=20, max_attempts=5, strategy='random', workers=DEFAULT_WORKERS,
+                  chunksize=16, seed=None, start=0, grammar=None, metric='overlap', use_cache=True):
+    """Lazily rewrite an iterable of texts, yielding RewriteResult in input order.
+
+    Texts are pulled from the iterable only as results are consumed, so memory
+    stays flat for any corpus size. With workers > 1 chunks of `chunksize`
+    texts are rewritten on the shared process pool, with at most 2 * workers
+    chunks in flight. With a seed every text is rewritten with seed
+    '<seed>:<index>', so output does not depend on workers or chunksize;
+    start is the index of the first text (for resumed runs).
+    """
+    if strategy not in REWRITE_STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy!r}, expected one of {REWRITE_STRATEGIES}")
+    if metric not in SIMILARITY_METRICS:
+        raise ValueError(f"Unknown similarity metric {metric!r}, expected one of {SIMILARITY_METRICS}")
+    get_pipeline(grammar)
+
+    def item_seed(index):
+        return None if seed is None else f'{seed}:{index}'
+
+    if not workers or workers <= 1:
+        for index, text in enumerate(texts, start):
+            rewritten, similarity = guarantee_low_similarity(text, max_similarity, max_attempts, strategy,
+                                                             workers=1, seed=item_seed(index), use_cache=use_cache,
+                                                             grammar=grammar, metric=metric)
+            yield RewriteResult(index, text, rewritten, similarity)
+        return
+
+    pool = get_process_pool(workers)
+    iterator = iter(texts)
+    pending = deque()
+    try:
+        while True:
+            chunk = list(itertools.islice(iterator, max(1, chunksize)))
+            if not chunk:
+                break
+            pending.append(pool.submit(_batch_chunk, start, chunk, max_similarity, max_attempts,
+                                       strategy, [item_seed(start + i) for i in range(len(chunk))], grammar,
+                                       metric, use_cache))
+            start += len(chunk)
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+# =========================
+# STREAMING
+# =========================
+STREAM_UNITS = ('sentence', 'paragraph')
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+
+class RewriteChunk(NamedTuple):
+    index: int
+    paragraph: int
+    original: str
+    rewritten: str
+    similarity: float
+
+def split_units(text, unit='sentence'):
+    """(paragraph index, unit text) pairs; sentences keep their closing punctuation"""
+    paragraphs = [p.strip() for p in _PARAGRAPH_BREAK.split(text or '') if p.strip()]
+    for index, paragraph in enumerate(paragraphs):
+        if unit == 'paragraph':
+            yield index, paragraph
+            continue
+        for start, end in tokenize(paragraph).sentence_spans():
+            yield index, paragraph[start:end]
+
+def stream_rewrite(original_text, max_similarity=20, max_attempts=5, unit='sentence', strategy='random',
+                   workers=DEFAULT_WORKERS, seed=None, grammar=None, metric='overlap'):
+    """Yield a RewriteChunk per sentence (or paragraph) as soon as it meets its own target.
+
+    Units are rewritten independently and in order, so the first chunk arrives
+    after one sentence's worth of work regardless of document length.
+    """
+    if unit not in STREAM_UNITS:
+        raise ValueError(f"Unknown unit {unit!r}, expected one of {STREAM_UNITS}")
+
+    units = list(split_units(original_text, unit))
+    results = rewrite_batch((text for _, text in units), max_similarity, max_attempts, strategy,
+                            workers=workers, chunksize=1, seed=seed, grammar=grammar, metric=metric)
+    for (paragraph, _), result in zip(units, results):
+        yield RewriteChunk(result.index, paragraph, result.original, result.rewritten, result.similarity)
+
+def join_chunks(chunks):
+    """Reassemble streamed chunks, keeping paragraph breaks"""
+    paragraphs = {}
+    for chunk in chunks:
+        paragraphs.setdefault(chunk.paragraph, []).append(chunk.rewritten)
+    return '\n\n'.join(' '.join(parts) for _, parts in sorted(paragraphs.items()))
+
+# =========================
+# LONG DOCUMENTS
+# =========================
+# Sentences per independently rewritten chunk (REWRITER_CHUNK_SENTENCES)
+DOCUMENT_CHUNK_SENTENCES = int(os.environ.get('REWRITER_CHUNK_SENTENCES', '5'))
+
+def split_chunks(text, max_sentences=DOCUMENT_CHUNK_SENTENCES):
+    """(paragraph index, chunk text) pairs: runs of up to max_sentences sentences within one paragraph"""
+    current, sentences = None, []
+    for paragraph, sentence in split_units(text, 'sentence'):
+        if sentences and (paragraph != current or len(sentences) >= max_sentences):
+            yield current, ' '.join(sentences)
+            sentences = []
+        current = paragraph
+        sentences.append(sentence)
+    if sentences:
+        yield current, ' '.join(sentences)
+
+def rewrite_document(original_text, max_similarity=20, max_attempts=5, strategy='random',
+                     workers=DEFAULT_WORKERS, seed=None, grammar=None, metric='overlap',
+                     chunk_sentences=DOCUMENT_CHUNK_SENTENCES, progress=None, use_cache=True):
+    """Rewrite a long document as independent chunks; returns (rewritten, similarity).
+
+    Paragraphs are cut into runs of up to chunk_sentences sentences. Each chunk
+    is rewritten to meet max_similarity on its own, concurrently on the process
+    pool when workers > 1, and the chunks are put back in order with paragraph
+    breaks kept, so sentences never move between chunks or paragraphs. The
+    returned similarity is measured on the whole document. With a seed the
+    output does not depend on workers (chunk i is seeded '<seed>:<i>').
+
+    progress, if given, gets a RewriteProgress counting finished chunks.
+    """
+    if not original_text:
+        return original_text, 0
+
+    chunks = list(split_chunks(original_text, chunk_sentences))
+    with instrumentation.trace_request('rewrite_document', workers=workers, chunks=len(chunks),
+                                       characters=len(original_text)):
+        # a few pool jobs per worker keeps them busy without one job per sentence run
+        chunksize = max(1, len(chunks) // (4 * max(1, workers or 1)))
+        results = rewrite_batch((text for _, text in chunks), max_similarity, max_attempts, strategy,
+                                workers=workers, chunksize=chunksize, seed=seed, grammar=grammar,
+                                metric=metric, use_cache=use_cache)
+        rewritten_chunks = []
+        for (paragraph, _), result in zip(chunks, results):
+            rewritten_chunks.append(RewriteChunk(result.index, paragraph, result.original, result.rewritten,
+                                                 result.similarity))
+            if progress is not None:
+                progress(RewriteProgress(1, 1, len(rewritten_chunks), len(chunks)))
+
+        rewritten = join_chunks(rewritten_chunks)
+        with instrumentation.stage('similarity'):
+            similarity = calculate_similarity(original_text, rewritten, metric)
+
+    if progress is not None:
+        progress(RewriteProgress(1, 1, len(chunks), len(chunks), similarity, finished=True))
+    return rewritten, similarity
+
 def get_vocabulary_stats():
-    return pure_rewriter.get_vocabulary_info()
+    return get_rewriter().get_vocabulary_info()
 
 # =========================
 # TEST
@@ -0,0 +1,304 @@
+# =========================
+# REWRITER BENCHMARK
+# =========================
+#
+# Measures cold start, per-stage latency and end-to-end throughput over a
+# fixed, generated corpus (one sentence up to 50 pages), and writes the
+# results as JSON so runs can be compared across commits:
+#
+#     python benchmark.py -o bench.json
+#     python benchmark.py --baseline bench.json --threshold 0.25
+#
+# With --baseline every timing that got slower than the baseline by more
+# than --threshold (a fraction) is reported and the exit status is 1.
+# The corpus and every rewrite are seeded, so runs do the same work.
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (name, sentences, repeats) - ~12 words per sentence, 40 sentences per page
+CORPUS_SIZES = [
+    ('1_sentence', 1, 20),
+    ('1_paragraph', 5, 20),
+    ('1_page', 40, 10),
+    ('10_pages', 400, 5),
+    ('50_pages', 2000, 3),
+]
+
+CORPUS_SEED = 1234
+REWRITE_SEED = 42
+
+# Sentences are assembled from these parts so long texts keep a realistic,
+# growing vocabulary instead of repeating a handful of sentences
+_SUBJECTS = [
+    "The patient", "Our doctor", "The research team", "The new software", "The city council",
+    "Most investors", "The author", "Every student", "The company", "Local farmers",
+    "The committee", "Young athletes", "The hospital", "Regular maintenance", "The government",
+]
+_VERBS = [
+    "needs", "recommends", "improves", "reviews", "reduces", "supports", "describes", "analyzes",
+    "increases", "requires", "protects", "explains", "prevents", "delivers", "discusses",
+]
+_OBJECTS = [
+    "immediate treatment", "a balanced diet", "overall performance", "the final proposal",
+    "the risk of heart disease", "public transport funding", "historical events", "customer behavior",
+    "blood pressure", "several security issues", "water supplies", "quarterly earnings",
+    "early detection of cancer", "the spread of infection", "long term memory",
+]
+_MODIFIERS = [
+    "before the end of the month", "despite rising costs", "with remarkable clarity",
+    "according to recent studies", "in rural communities", "during the winter season",
+    "without any additional support", "after careful consideration", "across the whole region",
+    "for the first time", "under difficult conditions", "at a surprisingly low price",
+    "because of growing uncertainty", "in the coming years", "with great attention to detail",
+]
+
+
+def build_corpus():
+    """{name: text} for every size; deterministic across runs and machines"""
+    rng = random.Random(CORPUS_SEED)
+    corpus = {}
+    for name, count, _ in CORPUS_SIZES:
+        sentences = [f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} "
+                     f"{rng.choice(_MODIFIERS)}." for _ in range(count)]
+        # five sentences per paragraph, like ordinary prose
+        paragraphs = [' '.join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)]
+        corpus[name] = '\n\n'.join(paragraphs)
+    return corpus
+
+
+# =========================
+# MEASUREMENT
+# =========================
+def measure(func, repeats):
+    """Run func `repeats` times; return timing summary in milliseconds"""
+    timings = []
+    for _ in range(max(1, repeats)):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'runs': len(timings),
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+        'max_ms': round(max(timings), 3),
+    }
+
+
+def cold_start(mode, repeats=3):
+    """Fresh interpreters: import backend and build the rewriter, timed from inside (medians).
+
+    The vocabulary is loaded once, by get_rewriter(); its share is the loader
+    time the backend records while building.
+    """
+    code = ("import time; started = time.perf_counter(); import backend; "
+            "backend.get_rewriter(); ready = time.perf_counter(); "
+            "print(backend._backend_info['vocabulary_seconds'], ready - started)")
+    runs = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True,
+                                text=True, check=True, env={**os.environ, 'REWRITER_VOCAB_MODE': mode})
+        runs.append([float(value) * 1000 for value in output.stdout.strip().splitlines()[-1].split()])
+    return {'vocabulary_loader_ms': round(statistics.median(run[0] for run in runs), 3),
+            'import_to_ready_ms': round(statistics.median(run[1] for run in runs), 3)}
+
+
+def stage_benchmarks(backend, corpus, repeats_by_size):
+    """Median latency of each pipeline stage for every corpus size"""
+    rewriter = backend.get_rewriter()
+    results = {}
+    for name, text in corpus.items():
+        repeats = repeats_by_size[name]
+        rng = random.Random(REWRITE_SEED)
+        rewritten = rewriter.intelligent_word_replacement(text, rng)
+        aggressive = backend.get_pipeline('aggressive')
+        # vectorized metrics score an already tokenized rewrite, as inside guarantee_low_similarity
+        rewritten_tokens = backend.tokenize(rewritten).tokens
+        scorers = {metric: backend.metric_scorer(text, metric) for metric in backend.SIMILARITY_METRICS
+                   if metric != 'overlap'}
+        results[name] = {
+            'words': len(text.split()),
+            'varied_sentence_restructure': measure(lambda: rewriter.varied_sentence_restructure(text, rng), repeats),
+            'intelligent_word_replacement': measure(lambda: rewriter.intelligent_word_replacement(text, rng), repeats),
+            'correct_grammar': measure(lambda: backend.correct_grammar(rewritten), repeats),
+            'correct_grammar_aggressive': measure(lambda: aggressive.correct(rewritten), repeats),
+            'calculate_similarity': measure(lambda: backend.calculate_similarity(text, rewritten), repeats),
+            **{f'similarity_{metric}': measure(lambda scorer=scorer: scorer.score_tokens(rewritten_tokens), repeats)
+               for metric, scorer in scorers.items()},
+        }
+    return results
+
+
+def end_to_end_benchmarks(backend, corpus, repeats_by_size, max_similarity, max_attempts, strategy, workers,
+                          grammar=None, metric='overlap', document=False):
+    """guarantee_low_similarity (or rewrite_document) latency and throughput per corpus size, cache bypassed"""
+    rewrite = backend.rewrite_document if document else backend.guarantee_low_similarity
+    results = {}
+    for name, text in corpus.items():
+        words = len(text.split())
+        timing = measure(lambda: rewrite(
+            text, max_similarity, max_attempts, strategy, workers=workers, seed=REWRITE_SEED, use_cache=False,
+            grammar=grammar, metric=metric), repeats_by_size[name])
+        _, similarity = rewrite(
+            text, max_similarity, max_attempts, strategy, workers=workers, seed=REWRITE_SEED, use_cache=False,
+            grammar=grammar, metric=metric)
+        results[name] = {
+            **timing,
+            'words': words,
+            'words_per_second': round(words / (timing['median_ms'] / 1000), 1) if timing['median_ms'] else None,
+            'similarity': round(similarity, 2),
+        }
+    return results
+
+
+# =========================
+# BASELINE COMPARISON
+# =========================
+def _timings(results, prefix=''):
+    """Flatten comparable timings into {'path.to.metric': ms}.
+
+    Repeated measurements compare on their best run (min_ms), which is far
+    less sensitive to scheduler noise than the median; cold start is already
+    a median over fresh interpreters.
+    """
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            if 'min_ms' in value:
+                flat[path] = value['min_ms']
+            else:
+                flat.update(_timings(value, path + '.'))
+        elif key.endswith('_ms'):
+            flat[path] = value
+    return flat
+
+
+def compare(current, baseline, threshold, min_delta_ms=1.0):
+    """Metrics slower than baseline by more than threshold: [(metric, baseline, current, ratio)].
+
+    Differences under min_delta_ms are timer noise on sub-millisecond stages and never count.
+    """
+    now = _timings({k: current[k] for k in ('cold_start', 'stages', 'end_to_end') if k in current})
+    before = _timings({k: baseline[k] for k in ('cold_start', 'stages', 'end_to_end') if k in baseline})
+    regressions = []
+    for metric, value in sorted(now.items()):
+        old = before.get(metric)
+        if old and value > old * (1 + threshold) and value - old >= min_delta_ms:
+            regressions.append((metric, old, value, value / old))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# =========================
+# MAIN
+# =========================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the rewrite pipeline.')
+    parser.add_argument('-o', '--output', help='write JSON results here (default: stdout)')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown vs baseline as a fraction (default 0.25)')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='ignore slowdowns smaller than this many milliseconds')
+    parser.add_argument('--sizes', nargs='+', choices=[name for name, _, _ in CORPUS_SIZES],
+                        help='corpus sizes to run (default: all)')
+    parser.add_argument('--repeat-scale', type=float, default=1.0, help='multiply every repeat count')
+    parser.add_argument('--cold-start-modes', nargs='*', default=['snapshot'],
+                        choices=('snapshot', 'lazy', 'eager'))
+    parser.add_argument('--max-similarity', type=float, default=20)
+    parser.add_argument('--max-attempts', type=int, default=5)
+    parser.add_argument('--strategy', choices=('random', 'search'), default='random')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--grammar', choices=('none', 'light', 'aggressive'), default='light')
+    parser.add_argument('--metric', choices=('overlap', 'jaccard', 'cosine', 'ngram', 'shingle'), default='overlap')
+    parser.add_argument('--document', action='store_true',
+                        help='time rewrite_document (parallel chunks) instead of guarantee_low_similarity')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    corpus = build_corpus()
+    if args.sizes:
+        corpus = {name: text for name, text in corpus.items() if name in args.sizes}
+    repeats_by_size = {name: max(1, round(repeats * args.repeat_scale)) for name, _, repeats in CORPUS_SIZES}
+
+    print("⏱️ Cold start...", file=sys.stderr)
+    cold = {mode: cold_start(mode) for mode in args.cold_start_modes}
+
+    # backend logs to stdout; keep stdout clean for the JSON results
+    with contextlib.redirect_stdout(sys.stderr):
+        import backend
+        backend.get_rewriter()
+
+    print("⏱️ Stages...", file=sys.stderr)
+    stages = stage_benchmarks(backend, corpus, repeats_by_size)
+    print("⏱️ End to end...", file=sys.stderr)
+    end_to_end = end_to_end_benchmarks(backend, corpus, repeats_by_size, args.max_similarity,
+                                       args.max_attempts, args.strategy, args.workers, args.grammar, args.metric,
+                                       args.document)
+
+    results = {
+        'meta': {
+            'commit': _git_commit(),
+            'timestamp': time.time(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'settings': {'max_similarity': args.max_similarity, 'max_attempts': args.max_attempts,
+                         'strategy': args.strategy, 'workers': args.workers, 'grammar': args.grammar,
+                         'metric': args.metric, 'document': args.document,
+                         'repeat_scale': args.repeat_scale, 'seed': REWRITE_SEED},
+            'vocabulary': backend.get_vocabulary_stats(),
+        },
+        'cold_start': cold,
+        'stages': stages,
+        'end_to_end': end_to_end,
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+        print(f"✅ Results written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    for name, result in end_to_end.items():
+        print(f"📊 {name:>12}: {result['median_ms']:>10,.1f} ms  "
+              f"{result['words_per_second'] or 0:>10,.0f} words/s  {result['similarity']:.1f}%", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) over {args.threshold:.0%} "
+                  f"vs {baseline.get('meta', {}).get('commit')}:", file=sys.stderr)
+            for metric, old, new, ratio in regressions:
+                print(f"   {metric}: {old:,.2f} -> {new:,.2f} ms ({ratio:.2f}x)", file=sys.stderr)
+            return 1
+        print(f"✅ No regressions over {args.threshold:.0%}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
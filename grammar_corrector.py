@@ -1,13 +1,85 @@
+# =========================
+# AGGRESSIVE GRAMMAR CORRECTOR
+# =========================
+#
+# Every rule is compiled once at import. The regex repairs (broken sentence
+# joins plus mid-sentence capitals) run as one alternation pass and the
+# pronoun fixes as another, instead of one full-string pass per rule.
+# Literal starter removal stays on str.replace, which scans in C and beats
+# any Python-level automaton; the removal order is kept because removing one
+# starter can expose another. Output must stay identical to the original
+# corrector: python grammar_golden.py checks it against recorded outputs.
+
 import re
 
+SENTENCE_STARTERS_TO_REMOVE = [
+    'Interestingly,', 'Significantly,', 'Similarly,', 'Accordingly,',
+    'Consequently,', 'Moreover,', 'Therefore,', 'Notably,', 'Remarkably,',
+    'In conclusion,', 'For example,', 'What explains', 'Why is it meaningful that',
+    'revealing how', 'which highlights', 'thereby illustrating'
+]
+
+GARBAGE_PHRASES = [
+    'which highlights to clean up pollutants',
+    'revealing how where it has revolutionized',
+    'what explains and environmental',
+    'why is it meaningful that and the potential',
+]
+
+# One pass for all broken-join and capitalisation repairs:
+#   ". Biofuels to"        -> ", biofuels to"
+#   ". And " / ". Plays "  -> ", and " / ", plays "
+#   ". Yields "            -> ", yielding "
+#   ", Random "            -> ", random "
+# Each alternative anchors on its own '.' or ',' so matches never overlap,
+# which keeps the result identical to applying the rules one after another.
+_REPAIR = re.compile(
+    r'\.\s*(?P<to>[A-Z][a-z]*)\s+to\s+'
+    r'|\.\s+(?P<join>And|Plays|Yields)\s+'
+    r'|,\s+(?P<word>[A-Z][a-z]+)\s+'
+)
+_JOINS = {'And': ', and ', 'Plays': ', plays ', 'Yields': ', yielding '}
+_DUPLICATE_THEREBY = re.compile(r', thereby illustrating.*?, thereby')
+
+# "regardless of it's" / "despite it's" never survive the it's -> its fix,
+# so those rules collapse into it
+_PRONOUNS = re.compile(r"\b(?:(?P<its>it's)|(?P<their>they're)|(?P<where>where\s+it\s+has))\b", re.IGNORECASE)
+_PRONOUN_FIXES = {'its': 'its', 'their': 'their', 'where': 'where it has'}
+# characters IGNORECASE folds onto i/s that str.lower() does not
+_FOLDING_CHARS = ('ı', 'İ', 'ſ')
+
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+_QUESTION_WORDS = frozenset({'what', 'why', 'how'})
+_DOUBLE_COMMA = re.compile(r',\s*,')
+_DOUBLE_PERIOD = re.compile(r'\.\s*\.')
+
+
+def _repair_match(match):
+    to_word = match.group('to')
+    if to_word is not None:
+        # the capital-word rule would lower it on the next pass if it has 2+ letters
+        return f', {to_word.lower() if len(to_word) > 1 else to_word} to '
+    join = match.group('join')
+    if join is not None:
+        return _JOINS[join]
+    return ', ' + match.group('word').lower() + ' '
+
+
+def _pronoun_match(match):
+    return _PRONOUN_FIXES[match.lastgroup]
+
+
 class SuperGrammarCorrector:
     def __init__(self):
-        self.sentence_starters_to_remove = [
-            'Interestingly,', 'Significantly,', 'Similarly,', 'Accordingly,', 
-            'Consequently,', 'Moreover,', 'Therefore,', 'Notably,', 'Remarkably,',
-            'In conclusion,', 'For example,', 'What explains', 'Why is it meaningful that',
-            'revealing how', 'which highlights', 'thereby illustrating'
-        ]
+        self.sentence_starters_to_remove = list(SENTENCE_STARTERS_TO_REMOVE)
+        self._starter_variants = self._compile_starters()
+
+    def _compile_starters(self):
+        """Exact, case-lowered and upper-cased form of every starter, in removal order"""
+        variants = []
+        for starter in self.sentence_starters_to_remove:
+            variants.extend((starter, starter.lower(), starter.upper()))
+        return tuple(variants)
 
     def aggressive_sentence_repair(self, text):
         """Extremely aggressive sentence fixing"""
@@ -15,77 +87,50 @@ class SuperGrammarCorrector:
             return text
 
         # Step 1: Remove ALL problematic sentence starters
-        for starter in self.sentence_starters_to_remove:
-            text = text.replace(starter, '')
-            text = text.replace(starter.lower(), '')
-            text = text.replace(starter.upper(), '')
-
-        # Step 2: Fix broken sentence patterns
-        text = re.sub(r'\.\s*([A-Z][a-z]*)\s+to\s+', r', \1 to ', text)  # ". Biofuels to" -> ", biofuels to"
-        text = re.sub(r'\.\s+And\s+', r', and ', text)  # ". And " -> ", and "
-        text = re.sub(r'\.\s+Plays\s+', r', plays ', text)  # ". Plays " -> ", plays "
-        text = re.sub(r'\.\s+Yields\s+', r', yielding ', text)  # ". Yields " -> ", yielding "
-        
-        # Step 3: Fix random capitalized words mid-sentence
-        text = re.sub(r',\s+([A-Z][a-z]+)\s+', lambda m: ', ' + m.group(1).lower() + ' ', text)
-        
+        for variant in self._starter_variants:
+            text = text.replace(variant, '')
+
+        # Steps 2-3: Fix broken sentence patterns and capitalized words mid-sentence
+        text = _REPAIR.sub(_repair_match, text)
+
         # Step 4: Remove duplicate "thereby" phrases
-        text = re.sub(r', thereby illustrating.*?, thereby', ', thereby', text)
-        
-        return text
+        return _DUPLICATE_THEREBY.sub(', thereby', text)
 
     def fix_pronouns_and_contractions(self, text):
         """Fix it's/its, they're/their etc."""
-        fixes = {
-            r'\bit\'s\b': 'its',
-            r'\bthey\'re\b': 'their', 
-            r'\bwhere\s+it\s+has\b': 'where it has',
-            r'\bregardless of it\'s\b': 'despite its',
-            r'\bdespite it\'s\b': 'despite its',
-        }
-        
-        for error, correction in fixes.items():
-            text = re.sub(error, correction, text, flags=re.IGNORECASE)
-            
-        return text
+        lowered = text.lower()
+        if ("it's" not in lowered and "they're" not in lowered and 'where' not in lowered
+                and not any(char in text for char in _FOLDING_CHARS)):
+            return text
+        return _PRONOUNS.sub(_pronoun_match, text)
 
     def rebuild_sentences(self, text):
         """Completely rebuild broken sentences"""
-        # Split by periods but keep the content
-        parts = re.split(r'[.!?]+', text)
         valid_sentences = []
-        
-        for part in parts:
-            part = part.strip()
+
+        for part in _SENTENCE_SPLIT.split(text):
             words = part.split()
-            
+
             # Only keep reasonable sentences (4+ words, makes sense)
-            if len(words) >= 4 and not any(word in ['what', 'why', 'how'] for word in words[:2]):
+            if len(words) >= 4 and words[0] not in _QUESTION_WORDS and words[1] not in _QUESTION_WORDS:
                 # Capitalize first letter
-                if words and words[0][0].islower():
+                if words[0][0].islower():
                     words[0] = words[0].capitalize()
                 valid_sentences.append(' '.join(words))
-        
+
         # Rebuild text with proper punctuation
         if valid_sentences:
             text = '. '.join(valid_sentences) + '.'
         else:
             text = text[0].upper() + text[1:] if text else text
-            
+
         return text
 
     def remove_garbage_phrases(self, text):
         """Remove nonsensical phrases"""
-        garbage_phrases = [
-            r'which highlights to clean up pollutants',
-            r'revealing how where it has revolutionized',
-            r'what explains and environmental',
-            r'why is it meaningful that and the potential',
-        ]
-        
-        for phrase in garbage_phrases:
+        for phrase in GARBAGE_PHRASES:
             text = text.replace(phrase, '')
-            
+
         return text
 
     def correct_grammar_aggressive(self, text):
@@ -95,28 +140,28 @@ class SuperGrammarCorrector:
 
         # Step 1: Remove garbage phrases
         text = self.remove_garbage_phrases(text)
-        
+
         # Step 2: Aggressive sentence repair
         text = self.aggressive_sentence_repair(text)
-        
+
         # Step 3: Fix pronouns
         text = self.fix_pronouns_and_contractions(text)
-        
+
         # Step 4: Rebuild sentences completely
         text = self.rebuild_sentences(text)
-        
+
         # Step 5: Final cleanup
-        text = re.sub(r'\s+', ' ', text)
-        text = re.sub(r',\s*,', ',', text)
-        text = re.sub(r'\.\s*\.', '.', text)
+        text = ' '.join(text.split())  # collapses whitespace; the edges are stripped below anyway
+        text = _DOUBLE_COMMA.sub(',', text)
+        text = _DOUBLE_PERIOD.sub('.', text)
         text = text.strip()
-        
+
         # Ensure proper start and end
         if text and text[0].islower():
             text = text[0].upper() + text[1:]
         if text and not text.endswith('.'):
             text += '.'
-            
+
         return text
 
 # Create global instance
@@ -124,4 +169,4 @@ grammar_corrector = SuperGrammarCorrector()
 
 def correct_grammar(text):
     """Simple function to correct grammar"""
-    return grammar_corrector.correct_grammar_aggressive(text)
\ No newline at end of file
+    return grammar_corrector.correct_grammar_aggressive(text)
@@ -0,0 +1,62 @@
+# =========================
+# GRAMMAR CORRECTOR GOLDEN CHECK
+# =========================
+#
+# grammar_golden.jsonl holds inputs for correct_grammar together with the
+# output of the original (pre-compilation) SuperGrammarCorrector: the rule
+# examples, edge cases (case folding, whitespace, starters fused into other
+# words, short texts) and seeded rewriter output. Any optimisation of
+# grammar_corrector must keep every output identical:
+#
+#     python grammar_golden.py            # exit status 1 on any difference
+#     python grammar_golden.py --update   # re-record after an intended change
+
+import argparse
+import json
+import os
+import sys
+
+from grammar_corrector import correct_grammar
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grammar_golden.jsonl')
+
+
+def load_cases(path=GOLDEN_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def check(cases):
+    """[(line number, case, actual output)] of every case whose output changed"""
+    return [(number, case, actual) for number, case in enumerate(cases, 1)
+            if (actual := correct_grammar(case['input'])) != case['expected']]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare correct_grammar against recorded outputs.')
+    parser.add_argument('--path', default=GOLDEN_PATH)
+    parser.add_argument('--update', action='store_true', help='record the current outputs as expected')
+    args = parser.parse_args(argv)
+
+    cases = load_cases(args.path)
+    if args.update:
+        with open(args.path, 'w', encoding='utf-8') as f:
+            for case in cases:
+                f.write(json.dumps({'input': case['input'], 'expected': correct_grammar(case['input'])},
+                                   ensure_ascii=False) + '\n')
+        print(f"✅ Recorded {len(cases)} outputs in {args.path}")
+        return 0
+
+    failures = check(cases)
+    for number, case, actual in failures[:10]:
+        print(f"❌ line {number}: {case['input']!r}\n   expected {case['expected']!r}\n   got      {actual!r}",
+              file=sys.stderr)
+    if failures:
+        print(f"❌ {len(failures)} of {len(cases)} outputs differ", file=sys.stderr)
+        return 1
+    print(f"✅ All {len(cases)} outputs identical")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+# =========================
+# GRAMMAR PIPELINES
+# =========================
+#
+# Turns rewritten token sentences back into text at a chosen level of
+# correction, picked per request:
+#
+#     none        join sentences with periods, nothing else
+#     light       also capitalize every sentence (the default)
+#     aggressive  light, then grammar_corrector's full repair pass
+#
+# A pipeline is a renderer (token sentences -> text) followed by named text
+# stages. Each step is timed as its own 'grammar.<step>' instrumentation
+# stage, so traces show what every level costs. REWRITER_GRAMMAR sets the
+# default level; register_stage / register_pipeline add new ones.
+
+import os
+from typing import NamedTuple
+
+from tokenizer import render_tokens, tokenize
+import grammar_corrector
+import instrumentation
+
+
+def join_sentences(sentences):
+    """Token sentences joined with periods, as written"""
+    parts = [render_tokens(sentence).strip() for sentence in sentences]
+    result = '. '.join(part for part in parts if part)
+    if result and result[-1] not in '.!?':
+        result += '.'
+    return result
+
+def render_sentences(sentences):
+    """Simple grammar correction over token sentences: capitalize, join with periods"""
+    corrected = []
+
+    for sentence in sentences:
+        sentence = render_tokens(sentence).strip()
+        if sentence:
+            corrected.append(sentence[0].upper() + sentence[1:])
+
+    result = '. '.join(corrected)
+    if result and result[-1] not in '.!?':
+        result += '.'
+
+    return result
+
+
+class GrammarPipeline(NamedTuple):
+    name: str
+    renderer: str           # step turning token sentences into text
+    stages: tuple = ()      # text -> text steps run after it, in order
+    # True when a stage may drop or change words, so the similarity measured
+    # on the token sentences no longer describes the output
+    rescore: bool = False
+
+    def steps(self):
+        return (self.renderer,) + tuple(self.stages)
+
+    def render(self, sentences):
+        """Text of `sentences` at this correction level"""
+        with instrumentation.stage(f'grammar.{self.renderer}'):
+            text = _RENDERERS[self.renderer](sentences)
+        for name in self.stages:
+            with instrumentation.stage(f'grammar.{name}'):
+                text = _STAGES[name](text)
+        return text
+
+    def correct(self, text):
+        """Same correction applied to plain text"""
+        if not text:
+            return text
+        return self.render(tokenize(text).sentences())
+
+
+# =========================
+# REGISTRY
+# =========================
+_RENDERERS = {'join': join_sentences, 'capitalize': render_sentences}
+_STAGES = {'repair': grammar_corrector.correct_grammar}
+_PIPELINES = {}
+
+def register_stage(name, func):
+    """Make a text -> text step available to pipelines"""
+    _STAGES[name] = func
+
+def register_pipeline(name, renderer='capitalize', stages=(), rescore=False):
+    unknown = [step for step in stages if step not in _STAGES]
+    if renderer not in _RENDERERS or unknown:
+        raise ValueError(f"Unknown grammar step(s) {[renderer] if renderer not in _RENDERERS else unknown}")
+    pipeline = GrammarPipeline(name, renderer, tuple(stages), rescore)
+    _PIPELINES[name] = pipeline
+    return pipeline
+
+register_pipeline('none', 'join')
+register_pipeline('light', 'capitalize')
+register_pipeline('aggressive', 'capitalize', ('repair',), rescore=True)
+
+GRAMMAR_LEVELS = ('none', 'light', 'aggressive')
+DEFAULT_GRAMMAR = os.environ.get('REWRITER_GRAMMAR', 'light')
+
+def get_pipeline(name=None):
+    """Pipeline for a level name (DEFAULT_GRAMMAR when None)"""
+    name = name or DEFAULT_GRAMMAR
+    pipeline = _PIPELINES.get(name)
+    if pipeline is None:
+        raise ValueError(f"Unknown grammar level {name!r}, expected one of {tuple(_PIPELINES)}")
+    return pipeline
+
+def grammar_stats():
+    return {'default': DEFAULT_GRAMMAR,
+            'levels': {name: list(pipeline.steps()) for name, pipeline in _PIPELINES.items()}}
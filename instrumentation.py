@@ -0,0 +1,225 @@
+# =========================
+# INSTRUMENTATION
+# =========================
+#
+# Per-request traces for the rewrite pipeline. Each guarantee_low_similarity
+# / extreme_rewriter call opens a RequestTrace that collects stage timings
+# (load, tokenize, restructure, replace, similarity, grammar, search,
+# reference, plus one grammar.<step> entry per correction step), token and
+# replacement counts, cache hits and one record per attempt. Finished
+# traces are folded into process-wide counters (metrics_snapshot()) and,
+# when the 'rewriter.metrics' logger is enabled, emitted as one JSON line.
+#
+#     REWRITER_INSTRUMENT=0        disable tracing entirely
+#     REWRITER_METRICS_LOG=path    append JSON trace lines to a file
+#     REWRITER_PROFILE=1           cProfile every request (hot stacks in the trace)
+#
+# To profile one request only:
+#
+#     with instrumentation.trace_request('debug', profile=True) as trace:
+#         backend.guarantee_low_similarity(text)
+#     print(trace.profile)
+
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+
+ENABLED = os.environ.get('REWRITER_INSTRUMENT', '1') != '0'
+PROFILE_ALL = os.environ.get('REWRITER_PROFILE', '0') == '1'
+PROFILE_TOP = 25
+
+logger = logging.getLogger('rewriter.metrics')
+if os.environ.get('REWRITER_METRICS_LOG'):
+    _handler = logging.FileHandler(os.environ['REWRITER_METRICS_LOG'], encoding='utf-8')
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+
+_current = contextvars.ContextVar('rewriter_trace', default=None)
+
+
+class _Stage:
+    """Adds its wall time to one stage of a trace"""
+
+    __slots__ = ('trace', 'name', 'started')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        entry = self.trace.stages.setdefault(self.name, [0.0, 0])
+        entry[0] += time.perf_counter() - self.started
+        entry[1] += 1
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+class RequestTrace:
+    """Timings and counters of one request"""
+
+    def __init__(self, name, **fields):
+        self.name = name
+        self.fields = fields
+        self.started = time.perf_counter()
+        self.seconds = None
+        self.stages = {}      # name -> [seconds, calls]
+        self.counters = {}
+        self.attempts = []
+        self.profile = None
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def attempt(self, attempt, seconds, similarity=None, abandoned=False):
+        self.attempts.append({'attempt': attempt, 'ms': round(seconds * 1000, 3),
+                              'similarity': None if similarity is None else round(similarity, 2),
+                              'abandoned': abandoned})
+
+    def to_dict(self):
+        return {
+            'request': self.name,
+            **self.fields,
+            'ms': None if self.seconds is None else round(self.seconds * 1000, 3),
+            'stages': {name: {'ms': round(seconds * 1000, 3), 'calls': calls}
+                       for name, (seconds, calls) in self.stages.items()},
+            'counters': dict(self.counters),
+            'attempts': list(self.attempts),
+            **({'profile': self.profile} if self.profile is not None else {}),
+        }
+
+
+# =========================
+# PROCESS-WIDE COUNTERS
+# =========================
+_metrics_lock = threading.Lock()
+_metrics = {'requests': {}, 'stage_seconds': {}, 'stage_calls': {}, 'counters': {}, 'attempts': 0}
+
+
+def _record(trace):
+    with _metrics_lock:
+        requests = _metrics['requests']
+        requests[trace.name] = requests.get(trace.name, 0) + 1
+        for name, (seconds, calls) in trace.stages.items():
+            _metrics['stage_seconds'][name] = _metrics['stage_seconds'].get(name, 0.0) + seconds
+            _metrics['stage_calls'][name] = _metrics['stage_calls'].get(name, 0) + calls
+        for name, value in trace.counters.items():
+            _metrics['counters'][name] = _metrics['counters'].get(name, 0) + value
+        _metrics['attempts'] += len(trace.attempts)
+
+
+def metrics_snapshot():
+    """Counters accumulated by this process since start (or the last reset)"""
+    with _metrics_lock:
+        return {
+            'enabled': ENABLED,
+            'requests': dict(_metrics['requests']),
+            'attempts': _metrics['attempts'],
+            'counters': dict(_metrics['counters']),
+            'stages': {name: {'ms': round(seconds * 1000, 3), 'calls': _metrics['stage_calls'][name]}
+                       for name, seconds in _metrics['stage_seconds'].items()},
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        for key in ('requests', 'stage_seconds', 'stage_calls', 'counters'):
+            _metrics[key].clear()
+        _metrics['attempts'] = 0
+
+
+# =========================
+# TRACING API
+# =========================
+def current_trace():
+    return _current.get()
+
+
+def stage(name):
+    """Context manager timing `name` on the active trace (no-op without one)"""
+    trace = _current.get()
+    return trace.stage(name) if trace is not None else _NO_STAGE
+
+
+def count(name, n=1):
+    trace = _current.get()
+    if trace is not None:
+        trace.count(name, n)
+
+
+def _hot_stacks(profiler):
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({'function': f'{os.path.basename(filename)}:{line}({function})',
+                     'calls': calls, 'tottime_ms': round(tottime * 1000, 3),
+                     'cumtime_ms': round(cumtime * 1000, 3)})
+    rows.sort(key=lambda row: row['cumtime_ms'], reverse=True)
+    return rows[:PROFILE_TOP]
+
+
+class trace_request:
+    """Open a RequestTrace for the enclosed request; nested calls join the outer trace"""
+
+    def __init__(self, name, profile=False, **fields):
+        self.name = name
+        self.profile = profile or PROFILE_ALL
+        self.fields = fields
+        self.trace = None
+        self._token = None
+        self._profiler = None
+
+    def __enter__(self):
+        outer = _current.get()
+        if outer is not None or not ENABLED:
+            return outer
+        self.trace = RequestTrace(self.name, **self.fields)
+        self._token = _current.set(self.trace)
+        if self.profile:
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # another profiler is already active in this thread
+                self._profiler = None
+        return self.trace
+
+    def __exit__(self, exc_type, exc, tb):
+        trace = self.trace
+        if trace is None:
+            return False
+        if self._profiler is not None:
+            self._profiler.disable()
+            trace.profile = _hot_stacks(self._profiler)
+        _current.reset(self._token)
+        trace.seconds = time.perf_counter() - trace.started
+        if exc_type is not None:
+            trace.fields['error'] = exc_type.__name__
+        _record(trace)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(trace.to_dict(), ensure_ascii=False))
+        return False
@@ -0,0 +1,245 @@
+# =========================
+# NEAR-DUPLICATE INDEX (MINHASH / LSH)
+# =========================
+#
+# Checks a rewrite against a whole reference corpus (previously published
+# documents), not only against its own original. Every document is reduced
+# to a MinHash signature over its character shingles (the same shingles as
+# the 'shingle' similarity metric). Signatures are cut into bands, and each
+# band is stored in a SQLite table under one hashed bucket id. A query looks
+# up its own band buckets (one indexed lookup per band), so the cost depends
+# on the number of candidates, not on corpus size. It then estimates Jaccard
+# similarity from the candidates' stored signatures.
+#
+#     python near_duplicates.py add corpus.db published.jsonl --key-field url
+#     python near_duplicates.py query corpus.db "some text"
+#
+# guarantee_low_similarity uses the index named by REWRITER_REFERENCE_INDEX:
+# an attempt only meets its target when no indexed document is more similar
+# than REWRITER_REFERENCE_THRESHOLD percent (estimated shingle Jaccard).
+#
+# With the default 128 hashes in 32 bands of 4, a document at 50% Jaccard
+# becomes a candidate about 87% of the time, and at 60% about 99%.
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+from vector_similarity import SHINGLE_SIZE, shingle_hashes
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+DEFAULT_THRESHOLD = float(os.environ.get('REWRITER_REFERENCE_THRESHOLD', '50'))
+
+# shingles hashed per step when building a signature (bounds memory to ~4 MB)
+_SIGNATURE_CHUNK = 4096
+# SQLite host parameters per statement
+_QUERY_CHUNK = 500
+_EMPTY_HASH = np.uint32(0xFFFFFFFF)
+
+
+class MinHasher:
+    """MinHash signatures of character-shingle sets, reproducible from a seed"""
+
+    def __init__(self, num_perm=DEFAULT_NUM_PERM, seed=1, shingle_size=SHINGLE_SIZE):
+        self.num_perm = num_perm
+        self.seed = seed
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # multiply-shift hashing: (a * x + b) mod 2**64, top 32 bits; a odd
+        self._a = rng.integers(1, 1 << 63, size=(num_perm, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, text):
+        """uint32 array of num_perm minimum hashes (all 0xFFFFFFFF for text without shingles)"""
+        return self.signature_of_shingles(shingle_hashes(text.tokens if hasattr(text, 'tokens') else text or '',
+                                                         self.shingle_size))
+
+    def signature_of_shingles(self, shingles):
+        signature = np.full(self.num_perm, _EMPTY_HASH, dtype=np.uint32)
+        for start in range(0, len(shingles), _SIGNATURE_CHUNK):
+            chunk = shingles[start:start + _SIGNATURE_CHUNK][np.newaxis, :]
+            hashed = ((self._a * chunk + self._b) >> np.uint64(32)).astype(np.uint32)
+            np.minimum(signature, hashed.min(axis=1), out=signature)
+        return signature
+
+
+def estimate_similarity(signature, other):
+    """Estimated Jaccard similarity of the two shingle sets, in percent"""
+    return float(np.count_nonzero(signature == other)) / len(signature) * 100
+
+
+class NearDuplicateIndex:
+    """Persistent LSH index of MinHash signatures in one SQLite file"""
+
+    def __init__(self, path, num_perm=DEFAULT_NUM_PERM, bands=DEFAULT_BANDS, seed=1,
+                 threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        # an existing index keeps the parameters it was built with
+        settings = self._settings() or {'num_perm': num_perm, 'bands': bands, 'seed': seed,
+                                        'shingle_size': SHINGLE_SIZE}
+        if settings['num_perm'] % settings['bands']:
+            raise ValueError(f"num_perm ({settings['num_perm']}) must be a multiple of bands ({settings['bands']})")
+        self.bands = settings['bands']
+        self.rows = settings['num_perm'] // settings['bands']
+        self.hasher = MinHasher(settings['num_perm'], settings['seed'], settings['shingle_size'])
+        self._save_settings(settings)
+
+    # ---- storage ----
+    def _connection(self):
+        # connections must not cross a fork, so each process opens its own
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT)')
+            db.execute('CREATE TABLE IF NOT EXISTS documents ('
+                       'id INTEGER PRIMARY KEY, key TEXT UNIQUE, signature BLOB, added_at REAL)')
+            db.execute('CREATE TABLE IF NOT EXISTS buckets (bucket INTEGER, document INTEGER)')
+            db.execute('CREATE INDEX IF NOT EXISTS buckets_by_bucket ON buckets (bucket)')
+            db.execute('CREATE INDEX IF NOT EXISTS buckets_by_document ON buckets (document)')
+            db.commit()
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _settings(self):
+        rows = self._connection().execute('SELECT name, value FROM settings').fetchall()
+        return {name: json.loads(value) for name, value in rows} or None
+
+    def _save_settings(self, settings):
+        db = self._connection()
+        db.executemany('INSERT OR IGNORE INTO settings VALUES (?, ?)',
+                       [(name, json.dumps(value)) for name, value in settings.items()])
+        db.execute("INSERT OR IGNORE INTO settings VALUES ('generation', '0')")
+        db.commit()
+
+    def _buckets(self, signature):
+        """One signed 64-bit bucket id per band"""
+        rows = signature.reshape(self.bands, self.rows)
+        return [int.from_bytes(hashlib.blake2b(band.to_bytes(2, 'little') + rows[band].tobytes(),
+                                               digest_size=8).digest(), 'little', signed=True)
+                for band in range(self.bands)]
+
+    # ---- writes ----
+    def add(self, key, text):
+        self.add_many([(key, text)])
+
+    def add_many(self, documents):
+        """Index (key, text) pairs in one transaction; re-adding a key replaces it. Returns the count."""
+        rows = [(str(key), self.hasher.signature(text)) for key, text in documents]
+        with self._lock:
+            db = self._connection()
+            with db:
+                for key, signature in rows:
+                    old = db.execute('SELECT id FROM documents WHERE key = ?', (key,)).fetchone()
+                    if old:
+                        db.execute('DELETE FROM buckets WHERE document = ?', old)
+                        db.execute('DELETE FROM documents WHERE id = ?', old)
+                    document = db.execute('INSERT INTO documents (key, signature, added_at) VALUES (?, ?, ?)',
+                                          (key, signature.tobytes(), time.time())).lastrowid
+                    db.executemany('INSERT INTO buckets VALUES (?, ?)',
+                                   [(bucket, document) for bucket in self._buckets(signature)])
+                db.execute("UPDATE settings SET value = CAST(value AS INTEGER) + 1 WHERE name = 'generation'")
+        return len(rows)
+
+    # ---- queries ----
+    def query(self, text, threshold=None, limit=10):
+        """[(key, estimated similarity %)] of indexed documents at or above threshold, most similar first"""
+        return self.query_signature(self.hasher.signature(text), threshold, limit)
+
+    def query_signature(self, signature, threshold=None, limit=10):
+        threshold = self.threshold if threshold is None else threshold
+        if np.all(signature == _EMPTY_HASH):
+            return []
+        buckets = self._buckets(signature)
+        with self._lock:
+            db = self._connection()
+            placeholders = ','.join('?' * len(buckets))
+            documents = [row[0] for row in db.execute(
+                f'SELECT DISTINCT document FROM buckets WHERE bucket IN ({placeholders})', buckets)]
+            matches = []
+            for start in range(0, len(documents), _QUERY_CHUNK):
+                chunk = documents[start:start + _QUERY_CHUNK]
+                rows = db.execute(f'SELECT key, signature FROM documents WHERE id IN ({",".join("?" * len(chunk))})',
+                                  chunk).fetchall()
+                # all candidate signatures of the chunk compared in one go
+                stored = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.uint32).reshape(len(rows), -1)
+                similarities = np.count_nonzero(stored == signature, axis=1) / len(signature) * 100
+                matches.extend((rows[i][0], float(similarities[i])) for i in np.flatnonzero(similarities >= threshold))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches[:limit]
+
+    def max_similarity(self, text):
+        """Highest estimated similarity of text to any indexed candidate (0 when none share a bucket)"""
+        matches = self.query(text, threshold=0, limit=1)
+        return matches[0][1] if matches else 0
+
+    # ---- introspection ----
+    def generation(self):
+        """Bumped by every write, so cached results checked against an older corpus are not reused"""
+        row = self._connection().execute("SELECT value FROM settings WHERE name = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def fingerprint(self):
+        return f'{os.path.abspath(self.path)}@{self.generation()}:{self.threshold}'
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM documents').fetchone()[0]
+
+    def index_stats(self):
+        return {'path': self.path, 'documents': len(self), 'bands': self.bands, 'rows': self.rows,
+                'threshold': self.threshold, 'generation': self.generation()}
+
+
+# =========================
+# CLI
+# =========================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query a near-duplicate reference index.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('add', help='index documents from a .txt, .jsonl or .csv file')
+    add.add_argument('index')
+    add.add_argument('input')
+    add.add_argument('--text-field', default='text')
+    add.add_argument('--key-field', help='record field used as document key (default: line number)')
+    add.add_argument('--batch-size', type=int, default=1000)
+    query = commands.add_parser('query', help='list indexed documents similar to a text')
+    query.add_argument('index')
+    query.add_argument('text')
+    query.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    index = NearDuplicateIndex(args.index)
+    if args.command == 'query':
+        for key, similarity in index.query(args.text, args.threshold):
+            print(f"{similarity:6.1f}%  {key}")
+        return 0
+
+    from rewrite_cli import detect_format, read_records
+    records = read_records(args.input, detect_format(args.input), args.text_field)
+    started = time.perf_counter()
+    total = 0
+    batch = []
+    for number, record in enumerate(records, 1):
+        batch.append((record[args.key_field] if args.key_field else number, record[args.text_field] or ''))
+        if len(batch) >= args.batch_size:
+            total += index.add_many(batch)
+            batch = []
+            print(f"⚡ {total:,} documents | {total / (time.perf_counter() - started):,.1f} doc/s", file=sys.stderr)
+    total += index.add_many(batch)
+    print(f"✅ Indexed {total:,} documents into {args.index} ({len(index):,} total)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,63 @@
+# =========================
+# PHRASE MATCHER (MULTI-WORD HEADWORDS)
+# =========================
+#
+# About a third of the vocabulary headwords are phrases ("data structure",
+# "additive inverse", "18-karat gold"). PhraseMatcher indexes every phrase
+# by its first token together with the longest phrase length starting with
+# that token. Matching walks the text once, left to right; only tokens that
+# begin some phrase are probed (longest span first) against the vocabulary,
+# so cost stays linear in the text and independent of vocabulary size.
+#
+# The index holds one small int per distinct first token rather than a full
+# token trie, so the phrases themselves are never duplicated outside the
+# (possibly memory-mapped) vocabulary.
+
+
+def iter_phrase_keys(vocabulary):
+    """Multi-word headwords of a vocabulary mapping"""
+    phrase_keys = getattr(vocabulary, 'phrase_keys', None)
+    if phrase_keys is not None:
+        return phrase_keys()
+    return (key for key in vocabulary if ' ' in key)
+
+
+class PhraseMatcher:
+    """Leftmost-longest matcher for multi-word vocabulary headwords"""
+
+    def __init__(self, vocabulary, phrase_keys=None):
+        self.vocabulary = vocabulary
+        self.max_span = {}
+        self.phrase_count = 0
+
+        for phrase in phrase_keys if phrase_keys is not None else iter_phrase_keys(vocabulary):
+            tokens = phrase.split()
+            if len(tokens) < 2:
+                continue
+            self.phrase_count += 1
+            first = tokens[0]
+            if len(tokens) > self.max_span.get(first, 0):
+                self.max_span[first] = len(tokens)
+
+    def longest_match(self, tokens, start):
+        """Length (>= 2) of the longest phrase starting at tokens[start], or 0"""
+        max_span = self.max_span.get(tokens[start])
+        if not max_span:
+            return 0
+        for span in range(min(max_span, len(tokens) - start), 1, -1):
+            if ' '.join(tokens[start:start + span]) in self.vocabulary:
+                return span
+        return 0
+
+    def find_matches(self, tokens):
+        """Non-overlapping (start, end) spans of phrases in a list of lowercased tokens"""
+        matches = []
+        i = 0
+        while i < len(tokens):
+            span = self.longest_match(tokens, i)
+            if span:
+                matches.append((i, i + span))
+                i += span
+            else:
+                i += 1
+        return matches
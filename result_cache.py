@@ -0,0 +1,148 @@
+# =========================
+# REWRITE RESULT CACHE
+# =========================
+#
+# Content-addressed cache in front of guarantee_low_similarity. Keys are a
+# SHA-256 of the whitespace-normalised text, the rewrite settings (grammar
+# level and similarity metric included), the seed and the engine fingerprint
+# (vocabulary sources, snapshot format, term filter), so a changed
+# vocabulary never serves stale rewrites. Only reproducible results that met
+# their target are stored (see guarantee_low_similarity).
+#
+# Two tiers:
+#   memory  per-process LRU (REWRITER_CACHE_ENTRIES, default 1024, 0 disables)
+#   disk    optional SQLite file shared by every process (REWRITER_CACHE_PATH)
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MEMORY_ENTRIES = int(os.environ.get('REWRITER_CACHE_ENTRIES', '1024'))
+DEFAULT_DISK_PATH = os.environ.get('REWRITER_CACHE_PATH') or None
+DEFAULT_DISK_ENTRIES = int(os.environ.get('REWRITER_CACHE_DISK_ENTRIES', '100000'))
+
+# the disk tier is trimmed back to its limit once every this many stores
+_TRIM_EVERY = 1000
+
+
+def normalize_text(text):
+    """Whitespace-insensitive form of a text; the rewriter ignores spacing anyway"""
+    return ' '.join((text or '').split())
+
+
+def cache_key(text, max_similarity, max_attempts, strategy, seed, fingerprint, grammar='light', metric='overlap'):
+    """Hex SHA-256 identifying one rewrite request"""
+    settings = json.dumps([float(max_similarity), max_attempts, strategy, seed, fingerprint, grammar, metric])
+    digest = hashlib.sha256(settings.encode('utf-8'))
+    digest.update(b'\x00')
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """LRU memory tier with an optional SQLite tier behind it"""
+
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES, path=DEFAULT_DISK_PATH,
+                 disk_max_entries=DEFAULT_DISK_ENTRIES):
+        self.max_entries = max_entries
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0,
+                      'evictions': 0, 'disk_errors': 0}
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or self.path is not None
+
+    # ---- disk tier ----
+    def _connection(self):
+        # connections must not cross a fork, so each process opens its own
+        if self._db is None or self._db_pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS results ('
+                       'key TEXT PRIMARY KEY, rewritten TEXT, similarity REAL, created_at REAL)')
+            db.commit()
+            self._db, self._db_pid = db, os.getpid()
+        return self._db
+
+    def _disk_get(self, key):
+        try:
+            row = self._connection().execute(
+                'SELECT rewritten, similarity FROM results WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error:
+            self.stats['disk_errors'] += 1
+            return None
+        return (row[0], row[1]) if row else None
+
+    def _disk_put(self, key, result):
+        try:
+            db = self._connection()
+            db.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                       (key, result[0], result[1], time.time()))
+            if self.stats['stores'] % _TRIM_EVERY == 0:
+                db.execute('DELETE FROM results WHERE key IN (SELECT key FROM results '
+                           'ORDER BY created_at DESC LIMIT -1 OFFSET ?)', (self.disk_max_entries,))
+            db.commit()
+        except sqlite3.Error:
+            self.stats['disk_errors'] += 1
+
+    # ---- lookups ----
+    def _remember(self, key, result):
+        if self.max_entries <= 0:
+            return
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def get(self, key):
+        """(rewritten, similarity) for key, or None"""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return result
+
+            if self.path is not None:
+                result = self._disk_get(key)
+                if result is not None:
+                    self.stats['disk_hits'] += 1
+                    self._remember(key, result)
+                    return result
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key, result):
+        with self._lock:
+            self.stats['stores'] += 1
+            self._remember(key, result)
+            if self.path is not None:
+                self._disk_put(key, result)
+
+    def clear(self):
+        """Drop the memory tier (the disk tier is keyed by fingerprint and left alone)"""
+        with self._lock:
+            self._memory.clear()
+
+    def cache_stats(self):
+        lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+        hits = lookups - self.stats['misses']
+        return {
+            **self.stats,
+            'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'max_entries': self.max_entries,
+            'disk_path': self.path,
+        }
@@ -0,0 +1,217 @@
+# =========================
+# BULK REWRITER CLI
+# =========================
+#
+# Streams plain text (one text per line), JSONL or CSV files through
+# guarantee_low_similarity without the Streamlit UI:
+#
+#     python rewrite_cli.py input.jsonl -o output.jsonl --workers 4
+#     python rewrite_cli.py input.csv -o output.csv --text-field body --resume
+#
+# Results are written and flushed chunk by chunk. After every chunk the
+# number of finished input records is saved to <output>.checkpoint, and
+# --resume continues from there, appending to the existing output.
+#
+# --document treats the whole input file as one long document instead: its
+# paragraphs are rewritten in parallel chunks and written back in order.
+#
+#     python rewrite_cli.py book.txt -o book.rewritten.txt --document --workers 8
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import sys
+import time
+
+FORMATS = ('txt', 'jsonl', 'csv')
+
+
+def detect_format(path, explicit=None):
+    if explicit:
+        return explicit
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'jsonl'
+    if extension in ('csv', 'tsv'):
+        return 'csv'
+    return 'txt'
+
+
+# =========================
+# READERS
+# =========================
+def read_records(path, fmt, text_field):
+    """Yield input records as dicts holding at least text_field"""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'txt':
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield {text_field: line}
+        elif fmt == 'jsonl':
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not isinstance(record, dict) or text_field not in record:
+                    raise ValueError(f"{path}:{line_number}: missing '{text_field}' field")
+                yield record
+        else:
+            reader = csv.DictReader(f, delimiter='\t' if path.lower().endswith('.tsv') else ',')
+            if text_field not in (reader.fieldnames or []):
+                raise ValueError(f"{path}: no '{text_field}' column")
+            yield from reader
+
+
+# =========================
+# WRITERS
+# =========================
+class ResultWriter:
+    """Appends rewritten records to a JSONL, CSV or text file"""
+
+    def __init__(self, path, fmt, append):
+        self.fmt = fmt
+        exists = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8', newline='')
+        self.csv_writer = None
+        self.write_header = not exists
+
+    def write(self, record):
+        if self.fmt == 'jsonl':
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        elif self.fmt == 'csv':
+            if self.csv_writer is None:
+                self.csv_writer = csv.DictWriter(self.file, fieldnames=list(record), extrasaction='ignore')
+                if self.write_header:
+                    self.csv_writer.writeheader()
+            self.csv_writer.writerow(record)
+        else:
+            self.file.write(record['rewritten'].replace('\n', ' ') + '\n')
+
+    def flush(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.file.close()
+
+
+def read_checkpoint(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return int(json.load(f)['offset'])
+    except (OSError, ValueError, KeyError):
+        return 0
+
+
+def write_checkpoint(path, offset):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'offset': offset, 'updated_at': time.time()}, f)
+    os.replace(tmp_path, path)
+
+
+# =========================
+# MAIN
+# =========================
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk rewrite text, JSONL or CSV files.')
+    parser.add_argument('input', help='input file (.txt one text per line, .jsonl or .csv)')
+    parser.add_argument('-o', '--output', required=True, help='output file (.jsonl, .csv or .txt)')
+    parser.add_argument('--input-format', choices=FORMATS)
+    parser.add_argument('--output-format', choices=FORMATS)
+    parser.add_argument('--text-field', default='text', help='JSONL field / CSV column to rewrite')
+    parser.add_argument('--max-similarity', type=float, default=20)
+    parser.add_argument('--max-attempts', type=int, default=5)
+    parser.add_argument('--strategy', choices=('random', 'search'), default='random')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, help='make output reproducible')
+    parser.add_argument('--grammar', choices=('none', 'light', 'aggressive'),
+                        help='grammar correction level (default: REWRITER_GRAMMAR or light)')
+    parser.add_argument('--metric', choices=('overlap', 'jaccard', 'cosine', 'ngram', 'shingle'), default='overlap',
+                        help='similarity metric --max-similarity is measured in')
+    parser.add_argument('--document', action='store_true',
+                        help='rewrite the whole input file as one document, in parallel chunks')
+    parser.add_argument('--chunk-sentences', type=int, default=5,
+                        help='sentences per independently rewritten chunk with --document')
+    parser.add_argument('--chunk-size', type=int, default=256, help='records per write/checkpoint')
+    parser.add_argument('--resume', action='store_true', help='continue from <output>.checkpoint')
+    return parser.parse_args(argv)
+
+
+def rewrite_document_file(args):
+    """--document: one input file in, one rewritten document out"""
+    from backend import rewrite_document
+
+    with open(args.input, 'r', encoding='utf-8') as f:
+        text = f.read()
+
+    started = time.perf_counter()
+    rewritten, similarity = rewrite_document(text, args.max_similarity, args.max_attempts, args.strategy,
+                                             workers=args.workers, seed=args.seed, grammar=args.grammar,
+                                             metric=args.metric, chunk_sentences=args.chunk_sentences)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(rewritten + '\n')
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rewrote {len(text.split()):,} words in {elapsed:.2f}s "
+          f"({len(text) / elapsed / 1024 if elapsed else 0:,.1f} KiB/s) • similarity {similarity:.1f}% "
+          f"-> {args.output}", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.document:
+        return rewrite_document_file(args)
+    input_format = detect_format(args.input, args.input_format)
+    output_format = detect_format(args.output, args.output_format)
+    checkpoint_path = f'{args.output}.checkpoint'
+
+    offset = read_checkpoint(checkpoint_path) if args.resume else 0
+
+    # Imported here so --help stays instant
+    from backend import rewrite_batch
+
+    records = itertools.islice(read_records(args.input, input_format, args.text_field), offset, None)
+    writer = ResultWriter(args.output, output_format, append=args.resume and offset > 0)
+
+    started = time.perf_counter()
+    done = 0
+    characters = 0
+    try:
+        while True:
+            chunk = list(itertools.islice(records, args.chunk_size))
+            if not chunk:
+                break
+
+            texts = (record[args.text_field] or '' for record in chunk)
+            results = rewrite_batch(texts, args.max_similarity, args.max_attempts, args.strategy,
+                                    workers=args.workers, chunksize=max(1, args.chunk_size // max(1, args.workers * 2)),
+                                    seed=args.seed, start=offset + done, grammar=args.grammar,
+                                    metric=args.metric)
+            for record, result in zip(chunk, results):
+                writer.write({**record, 'rewritten': result.rewritten,
+                              'similarity': round(result.similarity, 2)})
+                characters += len(result.original)
+
+            writer.flush()
+            done += len(chunk)
+            write_checkpoint(checkpoint_path, offset + done)
+
+            elapsed = time.perf_counter() - started
+            print(f"⚡ {offset + done:,} records | {done / elapsed:,.1f} rec/s | "
+                  f"{characters / elapsed / 1024:,.1f} KiB/s", file=sys.stderr)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Rewrote {done:,} records in {elapsed:.2f}s "
+          f"({done / elapsed if elapsed else 0:,.1f} rec/s) -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
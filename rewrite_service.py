@@ -0,0 +1,297 @@
+# =========================
+# ASYNC HTTP REWRITE SERVICE
+# =========================
+#
+# JSON-in / JSON-out HTTP service on top of backend.py, for callers that
+# cannot drive the Streamlit UI:
+#
+#     python rewrite_service.py --port 8502 --workers 4
+#
+#     GET  /health          backend_health()
+#     GET  /stats           get_vocabulary_stats()
+#     POST /rewrite         {"text": ..., "max_similarity": 20, "max_attempts": 5, "strategy": "random", "seed": null,
+#                            "grammar": "light", "metric": "overlap"}
+#     POST /rewrite/batch   {"texts": [...], ...same options}
+#
+# Rewrites run on a worker pool (CPU-bound work never blocks the event
+# loop). Concurrent /rewrite requests arriving within a few milliseconds
+# of each other are grouped into one micro-batch; micro-batches and
+# /rewrite/batch requests are split into one job per pool worker, so every
+# worker takes a share. Workers load vocabulary
+# through the same snapshot as the UI. RewriteService.handle() has no
+# socket dependency, so LocalClient can exercise it in-process.
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import json
+import sys
+from urllib.parse import urlsplit
+
+import backend
+
+MAX_BODY_BYTES = 1024 * 1024
+MAX_BATCH_TEXTS = 1000
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def rewrite_items(items):
+    """Pool job: rewrite a list of request items in one worker round-trip"""
+    results = []
+    for item in items:
+        rewritten, similarity = backend.guarantee_low_similarity(
+            item['text'], item['max_similarity'], item['max_attempts'], item['strategy'], workers=1,
+            seed=item['seed'], grammar=item['grammar'], metric=item['metric'])
+        results.append({'rewritten': rewritten, 'similarity': round(similarity, 2)})
+    return results
+
+
+def _warm_worker():
+    backend.get_rewriter()
+
+
+def _parse_options(payload):
+    options = {
+        'max_similarity': payload.get('max_similarity', 20),
+        'max_attempts': payload.get('max_attempts', 5),
+        'strategy': payload.get('strategy', 'random'),
+        'seed': payload.get('seed'),
+        'grammar': payload.get('grammar') or backend.DEFAULT_GRAMMAR,
+        'metric': payload.get('metric', 'overlap'),
+    }
+    if (not isinstance(options['max_similarity'], (int, float)) or isinstance(options['max_similarity'], bool)
+            or not 0 <= options['max_similarity'] <= 100):
+        raise RequestError(400, "'max_similarity' must be a number between 0 and 100")
+    if (not isinstance(options['max_attempts'], int) or isinstance(options['max_attempts'], bool)
+            or not 1 <= options['max_attempts'] <= 50):
+        raise RequestError(400, "'max_attempts' must be an integer between 1 and 50")
+    if options['strategy'] not in backend.REWRITE_STRATEGIES:
+        raise RequestError(400, f"'strategy' must be one of {list(backend.REWRITE_STRATEGIES)}")
+    if options['seed'] is not None and (not isinstance(options['seed'], int) or isinstance(options['seed'], bool)):
+        raise RequestError(400, "'seed' must be an integer or null")
+    if options['grammar'] not in backend.GRAMMAR_LEVELS:
+        raise RequestError(400, f"'grammar' must be one of {list(backend.GRAMMAR_LEVELS)}")
+    if options['metric'] not in backend.SIMILARITY_METRICS:
+        raise RequestError(400, f"'metric' must be one of {list(backend.SIMILARITY_METRICS)}")
+    return options
+
+
+# =========================
+# REQUEST BATCHING
+# =========================
+class MicroBatcher:
+    """Groups items submitted within `window` seconds into one call of run_batch"""
+
+    def __init__(self, run_batch, window=0.005, max_batch=32):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._flush_handle = None
+        self.batches = 0
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        pending, self._pending = self._pending, []
+        if pending:
+            self.batches += 1
+            asyncio.ensure_future(self._run(pending))
+
+    async def _run(self, pending):
+        try:
+            results = await self.run_batch([item for item, _ in pending])
+        except Exception as e:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(pending, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# =========================
+# SERVICE
+# =========================
+class RewriteService:
+    def __init__(self, executor=None, workers=1, batch_window=0.005, max_batch=32):
+        self.executor = executor
+        self.workers = max(1, workers)
+        self.batcher = MicroBatcher(self._run_in_pool, batch_window, max_batch)
+        self.requests = 0
+
+    async def _run_in_pool(self, items):
+        """Rewrite items as up to `workers` pool jobs of contiguous items, results in order"""
+        loop = asyncio.get_running_loop()
+        size = -(-len(items) // self.workers) or 1
+        jobs = [loop.run_in_executor(self.executor, rewrite_items, items[start:start + size])
+                for start in range(0, len(items), size)]
+        return [result for results in await asyncio.gather(*jobs) for result in results]
+
+    async def handle(self, method, path, body=b''):
+        """Route one request; returns (status, JSON-serialisable payload)"""
+        self.requests += 1
+        try:
+            route = urlsplit(path).path.rstrip('/') or '/'
+            if route == '/health':
+                self._require(method, 'GET')
+                health = backend.backend_health()
+                health['service'] = {'requests': self.requests, 'batches': self.batcher.batches}
+                return 200, health
+            if route == '/stats':
+                self._require(method, 'GET')
+                return 200, backend.get_vocabulary_stats()
+            if route == '/rewrite':
+                self._require(method, 'POST')
+                payload = self._json(body)
+                text = payload.get('text')
+                if not isinstance(text, str):
+                    raise RequestError(400, "'text' must be a string")
+                item = {'text': text, **_parse_options(payload)}
+                return 200, await self.batcher.submit(item)
+            if route == '/rewrite/batch':
+                self._require(method, 'POST')
+                payload = self._json(body)
+                texts = payload.get('texts')
+                if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                    raise RequestError(400, "'texts' must be a list of strings")
+                if len(texts) > MAX_BATCH_TEXTS:
+                    raise RequestError(413, f"at most {MAX_BATCH_TEXTS} texts per batch")
+                options = _parse_options(payload)
+                results = await self._run_in_pool([{'text': text, **options} for text in texts])
+                return 200, {'results': results}
+            raise RequestError(404, f'no route for {route}')
+        except RequestError as e:
+            return e.status, {'error': str(e)}
+        except Exception as e:
+            return 500, {'error': f'{type(e).__name__}: {e}'}
+
+    @staticmethod
+    def _require(method, expected):
+        if method != expected:
+            raise RequestError(405, f'use {expected}')
+
+    @staticmethod
+    def _json(body):
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            raise RequestError(400, 'body must be JSON')
+        if not isinstance(payload, dict):
+            raise RequestError(400, 'body must be a JSON object')
+        return payload
+
+    # ---- HTTP/1.1 over asyncio streams ----
+    async def serve_connection(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            try:
+                method, target, _ = request_line.decode('latin-1').split(' ', 2)
+            except ValueError:
+                await self._respond(writer, 400, {'error': 'malformed request line'})
+                return
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            try:
+                length = int(headers.get('content-length') or 0)
+            except ValueError:
+                length = -1
+            if length < 0:
+                await self._respond(writer, 400, {'error': 'invalid Content-Length'})
+                return
+            if length > MAX_BODY_BYTES:
+                await self._respond(writer, 413, {'error': f'body larger than {MAX_BODY_BYTES} bytes'})
+                return
+            body = await reader.readexactly(length) if length else b''
+
+            status, payload = await self.handle(method.upper(), target, body)
+            await self._respond(writer, status, payload)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write(
+            f'HTTP/1.1 {status} {_REASONS.get(status, "")}\r\n'
+            f'Content-Type: application/json; charset=utf-8\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f'Connection: close\r\n\r\n'.encode('latin-1') + body)
+        await writer.drain()
+
+
+class LocalClient:
+    """In-process stub client: calls RewriteService.handle without sockets"""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def get(self, path):
+        return await self.service.handle('GET', path)
+
+    async def post(self, path, payload):
+        return await self.service.handle('POST', path, json.dumps(payload).encode('utf-8'))
+
+
+# =========================
+# MAIN
+# =========================
+async def serve(host, port, workers):
+    # Load before the pool starts so /stats is instant and forked workers inherit the mapping
+    backend.get_rewriter()
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_warm_worker)
+    service = RewriteService(executor, workers)
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    print(f"🧬 Rewrite service listening on http://{host}:{port} ({workers} workers)", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Async HTTP rewrite service.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+# =========================
+# SIMILARITY SCORING
+# =========================
+#
+# Similarity is the share of the original's distinct word terms that also
+# appear in the rewrite. SimilarityScorer preprocesses the original once;
+# SimilarityTracker follows a rewrite as it is produced so an attempt that
+# can no longer improve on the best result so far can be abandoned early.
+
+from tokenizer import WORD, TokenStream, terms_of, tokenize
+
+
+def overlap_similarity(original_terms, rewritten_terms):
+    """Percentage of original terms present in the rewritten terms"""
+    if not original_terms or not rewritten_terms:
+        return 0
+
+    common_words = original_terms & rewritten_terms
+    return len(common_words) / len(original_terms) * 100
+
+
+class SimilarityTracker:
+    """Incremental similarity of a rewrite against one scorer's original"""
+
+    __slots__ = ('original_terms', 'limit', 'matched', '_total')
+
+    def __init__(self, original_terms, limit=None):
+        self.original_terms = original_terms
+        self.limit = limit
+        self.matched = set()
+        self._total = len(original_terms)
+
+    def add_tokens(self, tokens):
+        original_terms = self.original_terms
+        for token in tokens:
+            if token.kind == WORD:
+                for term in terms_of(token.lower):
+                    if term in original_terms:
+                        self.matched.add(term)
+
+    @property
+    def similarity(self):
+        if not self._total:
+            return 0
+        return len(self.matched) / self._total * 100
+
+    @property
+    def exhausted(self):
+        """True once the score reached the limit - adding text never lowers it"""
+        return self.limit is not None and self.similarity >= self.limit
+
+
+class SimilarityScorer:
+    """calculate_similarity with the original text preprocessed once"""
+
+    def __init__(self, original):
+        stream = original if isinstance(original, TokenStream) else tokenize(original or '')
+        self.original_terms = stream.term_set()
+
+    def score_terms(self, rewritten_terms):
+        return overlap_similarity(self.original_terms, rewritten_terms)
+
+    def score(self, rewritten):
+        if not rewritten:
+            return 0
+        stream = rewritten if isinstance(rewritten, TokenStream) else tokenize(rewritten)
+        return self.score_terms(stream.term_set())
+
+    def tracker(self, limit=None):
+        """Start tracking a new rewrite; it is exhausted once it reaches limit"""
+        return SimilarityTracker(self.original_terms, limit)
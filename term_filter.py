@@ -0,0 +1,120 @@
+# =========================
+# TERM FILTER (STOPWORDS & PROTECTED TERMS)
+# =========================
+#
+# Decides which tokens the rewriter may touch. Stopwords are never replaced
+# on their own; protected terms (brand names, drug names, anything listed in
+# REWRITER_PROTECTED_TERMS or REWRITER_PROTECTED_TERMS_FILE) are never
+# replaced, neither alone nor as part of a phrase. Multi-word protected terms
+# ("new york") are matched over the token list with a first-word index, like
+# PhraseMatcher, and every word they cover is protected. Everything is
+# compiled once, and a single pre-pass over a token list yields the eligible
+# positions, so the replacement loop only visits those.
+
+import hashlib
+import os
+
+from tokenizer import WORD
+
+DEFAULT_STOPWORDS = frozenset({'the', 'a', 'an', 'and', 'or', 'but', 'in', 'on', 'at', 'to'})
+DEFAULT_MIN_LENGTH = 3
+
+# bits of randomness per Bernoulli draw; 16 keeps probabilities exact to 1/65536
+_DRAW_BITS = 16
+
+
+def _read_terms(path):
+    """One term per line; blank lines and # comments ignored"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+
+class TermFilter:
+    """Compiled stopword / protected-term rules shared by every rewrite"""
+
+    __slots__ = ('stopwords', 'protected', 'min_length', '_skip', '_phrase_span')
+
+    def __init__(self, stopwords=DEFAULT_STOPWORDS, protected=(), min_length=DEFAULT_MIN_LENGTH):
+        self.stopwords = frozenset(word.lower() for word in stopwords)
+        self.protected = frozenset(' '.join(term.lower().split()) for term in protected if term.strip())
+        self.min_length = min_length
+        self._skip = self.stopwords | self.protected
+        # first word -> longest multi-word protected term starting with it
+        self._phrase_span = {}
+        for term in self.protected:
+            words = term.split()
+            if len(words) > max(1, self._phrase_span.get(words[0], 0)):
+                self._phrase_span[words[0]] = len(words)
+
+    @classmethod
+    def from_env(cls):
+        """Default stopwords plus protected terms from the environment"""
+        protected = [term for term in os.environ.get('REWRITER_PROTECTED_TERMS', '').split(',') if term.strip()]
+        path = os.environ.get('REWRITER_PROTECTED_TERMS_FILE')
+        if path:
+            try:
+                protected.extend(_read_terms(path))
+            except OSError as e:
+                print(f"❌ Protected terms file unavailable: {str(e)}")
+        return cls(protected=protected)
+
+    def protected_mask(self, lowers):
+        """One byte per lowercased token: 1 where it belongs to a multi-word protected term"""
+        mask = bytearray(len(lowers))
+        phrase_span = self._phrase_span
+        if not phrase_span:
+            return mask
+        protected = self.protected
+        for start, first in enumerate(lowers):
+            max_span = phrase_span.get(first)
+            if not max_span:
+                continue
+            for span in range(min(max_span, len(lowers) - start), 1, -1):
+                if ' '.join(lowers[start:start + span]) in protected:
+                    mask[start:start + span] = b'\x01' * span
+                    break
+        return mask
+
+    def eligible_mask(self, tokens, protected=None):
+        """One byte per token: 1 where a single-word replacement is allowed.
+
+        `protected` is a protected_mask already computed for the same tokens.
+        """
+        skip = self._skip
+        min_length = self.min_length
+        mask = bytearray(token.kind == WORD and len(token.lower) >= min_length and token.lower not in skip
+                         for token in tokens)
+        if self._phrase_span:
+            if protected is None:
+                protected = self.protected_mask([token.lower for token in tokens])
+            for i, flag in enumerate(protected):
+                if flag:
+                    mask[i] = 0
+        return mask
+
+    def eligible(self, tokens, protected=None):
+        """Positions of tokens a single-word replacement may touch"""
+        return [i for i, flag in enumerate(self.eligible_mask(tokens, protected)) if flag]
+
+    def allows_phrase(self, words):
+        """False when a phrase is, or contains, a protected term"""
+        if not self.protected:
+            return True
+        return self.protected.isdisjoint(words) and not any(self.protected_mask(words))
+
+    def fingerprint(self):
+        """Short digest of the rules, for cache keys"""
+        rules = '\x00'.join(sorted(self.stopwords)) + '\x01' + '\x00'.join(sorted(self.protected))
+        return hashlib.sha256(f'{rules}\x01{self.min_length}'.encode('utf-8')).hexdigest()[:16]
+
+    def stats(self):
+        return {'stopwords': len(self.stopwords), 'protected_terms': len(self.protected),
+                'min_length': self.min_length}
+
+
+def bernoulli_draws(rng, count, probability):
+    """`count` independent draws that are True with `probability`, from one randbytes call"""
+    if count <= 0:
+        return []
+    threshold = round(probability * (1 << _DRAW_BITS))
+    return [value < threshold for value in memoryview(rng.randbytes(count * 2)).cast('H')]
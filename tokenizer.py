@@ -0,0 +1,143 @@
+# =========================
+# SHARED TOKENIZER
+# =========================
+#
+# One compiled regex scans the input once and produces a TokenStream that
+# every stage of the pipeline reuses: sentence restructuring, word and
+# phrase replacement, grammar rendering and similarity scoring. Tokens keep
+# their offsets, lowercase form, casing flag and whether whitespace preceded
+# them, so stages can rebuild text without re-scanning strings.
+
+from functools import lru_cache
+import re
+from typing import NamedTuple
+
+WORD = 'word'
+SENTENCE_END = 'end'
+PUNCT = 'punct'
+
+# words (with inner hyphens/apostrophes), runs of sentence enders, any other symbol
+TOKEN_PATTERN = re.compile(r"(\w+(?:['’-]\w+)*)|([.!?]+)|(\S)")
+TERM_PATTERN = re.compile(r'\w+')
+
+
+class Token(NamedTuple):
+    text: str
+    lower: str
+    kind: str
+    start: int = -1
+    end: int = -1
+    capitalized: bool = False
+    space_before: bool = True
+
+    @property
+    def is_word(self):
+        return self.kind == WORD
+
+    def replaced(self, text):
+        """A word token standing in for this one, keeping its position and spacing"""
+        return Token(text, text.lower(), WORD, self.start, self.end,
+                     text[:1].isupper(), self.space_before)
+
+
+@lru_cache(maxsize=65536)
+def terms_of(text):
+    """Lowercased \\w+ terms of a string - the unit calculate_similarity compares"""
+    return frozenset(TERM_PATTERN.findall(text.lower()))
+
+
+class TokenStream:
+    """Tokens of one input text, computed once and shared by every stage"""
+
+    __slots__ = ('text', 'tokens', '_sentences', '_terms')
+
+    def __init__(self, text, tokens):
+        self.text = text
+        self.tokens = tokens
+        self._sentences = None
+        self._terms = None
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def __iter__(self):
+        return iter(self.tokens)
+
+    @property
+    def words(self):
+        return [token for token in self.tokens if token.kind == WORD]
+
+    def sentences(self):
+        """Token lists between sentence-ending punctuation; empty sentences dropped"""
+        if self._sentences is None:
+            sentences = []
+            current = []
+            for token in self.tokens:
+                if token.kind == SENTENCE_END:
+                    if current:
+                        sentences.append(current)
+                    current = []
+                else:
+                    current.append(token)
+            if current:
+                sentences.append(current)
+            self._sentences = sentences
+        return [list(sentence) for sentence in self._sentences]
+
+    def sentence_spans(self):
+        """(start, end) character offsets of each sentence, closing punctuation included"""
+        spans = []
+        start = None
+        for token in self.tokens:
+            if token.kind == SENTENCE_END:
+                if start is not None:
+                    spans.append((start, token.end))
+                start = None
+            elif start is None:
+                start = token.start
+        if start is not None:
+            spans.append((start, self.tokens[-1].end))
+        return spans
+
+    def term_set(self):
+        """Set of lowercased word terms, as used for similarity"""
+        if self._terms is None:
+            self._terms = token_terms(self.tokens)
+        return self._terms
+
+
+def tokenize(text):
+    """Scan text once into a TokenStream"""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(text or ''):
+        word, end_punct, _ = match.groups()
+        start = match.start()
+        piece = match.group()
+        if word:
+            kind = WORD
+        elif end_punct:
+            kind = SENTENCE_END
+        else:
+            kind = PUNCT
+        tokens.append(Token(piece, piece.lower(), kind, start, match.end(),
+                            piece[:1].isupper(), start > 0 and text[start - 1].isspace()))
+    return TokenStream(text, tuple(tokens))
+
+
+def token_terms(tokens):
+    """Union of similarity terms over word tokens"""
+    terms = set()
+    for token in tokens:
+        if token.kind == WORD:
+            terms |= terms_of(token.lower)
+    return frozenset(terms)
+
+
+def render_tokens(tokens):
+    """Join tokens back into text using their recorded spacing"""
+    parts = []
+    for token in tokens:
+        if parts and token.space_before:
+            parts.append(' ')
+        parts.append(token.text)
+    return ''.join(parts)
@@ -0,0 +1,195 @@
+# =========================
+# VECTORIZED SIMILARITY METRICS
+# =========================
+#
+# Alternative similarity metrics computed on NumPy arrays of integer term
+# ids instead of Python sets of strings. Every metric returns a percentage,
+# like calculate_similarity:
+#
+#     overlap  share of the original's distinct terms found in the rewrite
+#              (the same number SimilarityScorer gives)
+#     jaccard  distinct terms in common / distinct terms in either text
+#     cosine   cosine of the two bag-of-words count vectors
+#     ngram    share of the original's word n-grams (NGRAM_SIZE) found in the rewrite
+#     shingle  share of the original's character shingles (SHINGLE_SIZE) found in the rewrite
+#
+# Term ids come from TermIds: headwords take their index in the vocabulary
+# snapshot, so common words get the same id in every process, and other
+# terms get overflow ids after those. VectorScorer prepares the original
+# once; scoring a rewrite then costs one id lookup per term plus a few
+# sorted-array intersections. N-grams and shingles are packed into 64-bit
+# hashes, where a collision between two different n-grams is about as likely
+# as two random 64-bit numbers being equal.
+
+from itertools import chain
+
+import numpy as np
+
+from tokenizer import TERM_PATTERN, WORD, TokenStream, tokenize
+
+SIMILARITY_METRICS = ('overlap', 'jaccard', 'cosine', 'ngram', 'shingle')
+NGRAM_SIZE = 3
+SHINGLE_SIZE = 5
+
+# a full TermIds is replaced by a fresh one (scorers keep the one they started with)
+MAX_TERM_IDS = 1 << 21
+
+# odd 64-bit multiplier for packing n-grams and shingles
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+class TermIds:
+    """Term -> integer id, shared by every scorer built on the same vocabulary"""
+
+    def __init__(self, vocabulary=None):
+        self._headword_index = getattr(vocabulary, 'headword_index', None)
+        self.base = len(vocabulary) if self._headword_index is not None else 0
+        self._ids = {}           # term -> id, every term looked up so far
+        self._word_ids = {}      # lowercased word token -> tuple of term ids
+        self.overflow = 0
+
+    @property
+    def full(self):
+        return len(self._ids) >= MAX_TERM_IDS
+
+    def term_id(self, term):
+        term_id = self._ids.get(term)
+        if term_id is None:
+            term_id = self._headword_index(term) if self._headword_index is not None else -1
+            if term_id < 0:
+                term_id = self.base + self.overflow
+                self.overflow += 1
+            self._ids[term] = term_id
+        return term_id
+
+    def word_ids(self, lower):
+        """Ids of the \\w+ terms of one lowercased word token, in order"""
+        ids = self._word_ids.get(lower)
+        if ids is None:
+            ids = tuple(self.term_id(term) for term in TERM_PATTERN.findall(lower))
+            if len(self._word_ids) < MAX_TERM_IDS:
+                self._word_ids[lower] = ids
+        return ids
+
+    def encode(self, tokens):
+        """int64 array of the term ids of the word tokens, in text order"""
+        word_ids = self.word_ids
+        return np.fromiter(chain.from_iterable(word_ids(token.lower) for token in tokens if token.kind == WORD),
+                           dtype=np.int64)
+
+    def stats(self):
+        return {'term_ids': len(self._ids), 'headword_ids': self.base, 'overflow_ids': self.overflow}
+
+
+def _terms_text(tokens):
+    """Lowercased terms joined by single spaces - what character shingles are taken from"""
+    return ' '.join(chain.from_iterable(TERM_PATTERN.findall(token.lower) for token in tokens
+                                        if token.kind == WORD))
+
+
+def _pack_windows(values, size):
+    """64-bit hash of every window of `size` consecutive values (one window of all of them when fewer)"""
+    size = min(size, len(values))
+    if not size:
+        return np.empty(0, dtype=np.uint64)
+    values = values.astype(np.uint64)
+    count = len(values) - size + 1
+    packed = values[:count].copy()
+    for offset in range(1, size):
+        packed *= _HASH_MULTIPLIER
+        packed ^= values[offset:offset + count]
+    return packed
+
+
+def shingle_hashes(text, size=SHINGLE_SIZE):
+    """Sorted unique 64-bit hashes of the character shingles of a text or token sequence.
+
+    Depends only on the text, never on term ids, so hashes can be stored and
+    compared across processes. Plain strings skip tokenization: their \\w+
+    terms are the same ones the word tokens would yield.
+    """
+    terms = ' '.join(TERM_PATTERN.findall(text.lower())) if isinstance(text, str) else _terms_text(text)
+    code_points = np.frombuffer(terms.encode('utf-32-le'), dtype=np.uint32)
+    return np.unique(_pack_windows(code_points, size))
+
+
+def _intersection(a, b):
+    """Size of the intersection of two sorted unique arrays"""
+    if not len(a) or not len(b):
+        return 0
+    return int(np.count_nonzero(np.isin(a, b, assume_unique=True)))
+
+
+class VectorScorer:
+    """One metric against one original, with the original prepared once"""
+
+    def __init__(self, original, metric='overlap', term_ids=None, ngram_size=NGRAM_SIZE,
+                 shingle_size=SHINGLE_SIZE):
+        if metric not in SIMILARITY_METRICS:
+            raise ValueError(f"Unknown similarity metric {metric!r}, expected one of {SIMILARITY_METRICS}")
+        self.metric = metric
+        self.term_ids = term_ids or TermIds()
+        tokens = self._tokens(original)
+        # an original shorter than a window is compared on shorter windows
+        # (down to single terms), so short texts do not always score 0
+        if metric == 'ngram':
+            ngram_size = max(1, min(ngram_size, len(self.term_ids.encode(tokens))))
+        elif metric == 'shingle':
+            shingle_size = max(1, min(shingle_size, len(_terms_text(tokens))))
+        self.ngram_size = ngram_size
+        self.shingle_size = shingle_size
+        self.original = self._features(tokens)
+        if metric == 'cosine':
+            _, counts = self.original
+            self._norm = float(np.sqrt(np.dot(counts, counts)))
+
+    @staticmethod
+    def _tokens(text):
+        if isinstance(text, TokenStream):
+            return text.tokens
+        if isinstance(text, str) or text is None:
+            return tokenize(text or '').tokens
+        return text
+
+    def _features(self, tokens):
+        """The metric's representation of a token sequence"""
+        if self.metric == 'shingle':
+            return shingle_hashes(tokens, self.shingle_size)
+        ids = self.term_ids.encode(tokens)
+        if self.metric == 'cosine':
+            values, counts = np.unique(ids, return_counts=True)
+            return values, counts.astype(np.float64)
+        if self.metric == 'ngram':
+            return np.unique(_pack_windows(ids, self.ngram_size))
+        return np.unique(ids)
+
+    def score_features(self, features):
+        metric = self.metric
+        original = self.original
+        if metric == 'cosine':
+            values, counts = original
+            other_values, other_counts = features
+            if not len(values) or not len(other_values):
+                return 0
+            _, mine, theirs = np.intersect1d(values, other_values, assume_unique=True, return_indices=True)
+            dot = float(np.dot(counts[mine], other_counts[theirs]))
+            # rounding can push identical texts a hair over 100
+            return min(100.0, dot / (self._norm * float(np.sqrt(np.dot(other_counts, other_counts)))) * 100)
+
+        if not len(original) or not len(features):
+            return 0
+        common = _intersection(original, features)
+        if metric == 'jaccard':
+            return common / (len(original) + len(features) - common) * 100
+        return common / len(original) * 100
+
+    def score_tokens(self, tokens):
+        return self.score_features(self._features(tokens))
+
+    def score_sentences(self, sentences):
+        return self.score_tokens(list(chain.from_iterable(sentences)))
+
+    def score(self, rewritten):
+        if not rewritten:
+            return 0
+        return self.score_tokens(self._tokens(rewritten))
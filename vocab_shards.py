@@ -0,0 +1,182 @@
+# =========================
+# LAZY SHARDED VOCABULARY
+# =========================
+#
+# The vocabulary/synonyms_NNN.py files are alphabetical shards. Instead of
+# parsing all of them up front, LazyShardedVocabulary keeps a small
+# headword-range index (first/last key of every shard) and parses a shard
+# the first time a word in its range is looked up. Parsed shards are reduced
+# to candidate tuples, kept in an LRU and evicted once their estimated size
+# exceeds the memory budget.
+
+from bisect import bisect_right
+from collections import OrderedDict
+from collections.abc import Mapping
+import os
+import re
+import sys
+import threading
+
+import vocab_snapshot
+
+DEFAULT_SHARD_BUDGET_BYTES = int(os.environ.get('REWRITER_SHARD_BUDGET_MB', '32')) * 1024 * 1024
+
+_KEY_LINE = re.compile(rb'^\s*["\'](.*?)["\']\s*:', re.MULTILINE)
+
+
+class Shard:
+    """Index entry for one synonyms_NNN.py file"""
+
+    __slots__ = ('path', 'first_key', 'last_key', 'entries', 'phrases')
+
+    def __init__(self, path, first_key, last_key, entries, phrases=()):
+        self.path = path
+        self.first_key = first_key
+        self.last_key = last_key
+        self.entries = entries
+        self.phrases = phrases
+
+    @property
+    def name(self):
+        return os.path.basename(self.path)
+
+
+def build_shard_index(paths=None):
+    """Scan shard files (without parsing them) and return Shards sorted by first key"""
+    shards = []
+    for path in paths if paths is not None else vocab_snapshot.synonym_source_files():
+        with open(path, 'rb') as f:
+            content = f.read()
+        keys = _KEY_LINE.findall(content)
+        if not keys:
+            continue
+        # multi-word headwords feed the phrase matcher without parsing the shard
+        phrases = tuple(key.decode('utf-8') for key in keys if b' ' in key)
+        shards.append(Shard(path, keys[0].decode('utf-8'), keys[-1].decode('utf-8'), len(keys), phrases))
+    # Later files win on duplicate headwords, so keep file order among equal ranges
+    shards.sort(key=lambda shard: shard.first_key)
+    return shards
+
+
+def _estimate_size(synonyms):
+    """Rough resident size of a parsed shard in bytes"""
+    size = sys.getsizeof(synonyms)
+    for key, values in synonyms.items():
+        size += sys.getsizeof(key) + sys.getsizeof(values)
+        if isinstance(values, tuple):
+            size += sum(sys.getsizeof(value) for value in values)
+    return size
+
+
+class LazyShardedVocabulary(Mapping):
+    """Headword -> candidate tuple mapping that loads alphabetical shards on demand"""
+
+    def __init__(self, base_vocabulary=None, shards=None, budget_bytes=DEFAULT_SHARD_BUDGET_BYTES):
+        self.base_vocabulary = base_vocabulary or {}
+        self.shards = shards if shards is not None else build_shard_index()
+        self.budget_bytes = budget_bytes
+
+        self._first_keys = [shard.first_key for shard in self.shards]
+        # running max of last_key lets the range walk stop early
+        self._max_last_keys = []
+        running = ''
+        for shard in self.shards:
+            running = max(running, shard.last_key)
+            self._max_last_keys.append(running)
+        self._order = {shard.path: i for i, shard in enumerate(
+            sorted(self.shards, key=lambda shard: shard.path))}
+
+        self._resident = OrderedDict()  # path -> (synonyms, estimated bytes)
+        self._resident_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'lookups': 0, 'shard_loads': 0, 'evictions': 0}
+
+    # ---- index ----
+    def _candidate_shards(self, key):
+        """Shards whose headword range covers key, latest source file first"""
+        candidates = []
+        i = bisect_right(self._first_keys, key) - 1
+        while i >= 0 and self._max_last_keys[i] >= key:
+            if self.shards[i].last_key >= key:
+                candidates.append(self.shards[i])
+            i -= 1
+        if len(candidates) > 1:
+            candidates.sort(key=lambda shard: self._order[shard.path], reverse=True)
+        return candidates
+
+    # ---- LRU ----
+    def _shard_synonyms(self, shard):
+        with self._lock:
+            entry = self._resident.get(shard.path)
+            if entry is not None:
+                self._resident.move_to_end(shard.path)
+                return entry[0]
+
+            with open(shard.path, 'r', encoding='utf-8') as f:
+                synonyms = vocab_snapshot.compile_candidates(vocab_snapshot.parse_synonym_source(f.read()))
+            size = _estimate_size(synonyms)
+            self._resident[shard.path] = (synonyms, size)
+            self._resident_bytes += size
+            self.stats['shard_loads'] += 1
+
+            # Evict least recently used shards, always keeping the one just loaded
+            while self._resident_bytes > self.budget_bytes and len(self._resident) > 1:
+                _, (_, evicted_size) = self._resident.popitem(last=False)
+                self._resident_bytes -= evicted_size
+                self.stats['evictions'] += 1
+            return synonyms
+
+    # ---- Mapping ----
+    def get(self, key, default=None):
+        if not isinstance(key, str):
+            return default
+        self.stats['lookups'] += 1
+        for shard in self._candidate_shards(key):
+            synonyms = self._shard_synonyms(shard)
+            if key in synonyms:
+                return synonyms[key]
+        return self.base_vocabulary.get(key, default)
+
+    def __getitem__(self, key):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        missing = object()
+        return self.get(key, missing) is not missing
+
+    def __iter__(self):
+        """Iterate every headword; base vocabulary first, then shards in file order"""
+        seen = set()
+        for key in self.base_vocabulary:
+            seen.add(key)
+            yield key
+        for shard in sorted(self.shards, key=lambda shard: shard.path):
+            for key in self._shard_synonyms(shard):
+                if key not in seen:
+                    seen.add(key)
+                    yield key
+
+    def __len__(self):
+        """Approximate headword count from the index (no shard is parsed)"""
+        return len(self.base_vocabulary) + sum(shard.entries for shard in self.shards)
+
+    def phrase_keys(self):
+        """Multi-word headwords taken from the index, so no shard is loaded"""
+        for key in self.base_vocabulary:
+            if ' ' in key:
+                yield key
+        for shard in self.shards:
+            yield from shard.phrases
+
+    def shard_stats(self):
+        return {
+            **self.stats,
+            'shards_indexed': len(self.shards),
+            'shards_resident': len(self._resident),
+            'resident_bytes': self._resident_bytes,
+            'budget_bytes': self.budget_bytes,
+        }
@@ -0,0 +1,476 @@
+# =========================
+# VOCABULARY SNAPSHOT (PRECOMPILED BINARY CACHE)
+# =========================
+#
+# Compiles every vocabulary source (health_terms, health_terms_2,
+# generalwords and vocabulary/synonyms_*.py) into one versioned binary
+# file. Workers memory-map the snapshot instead of re-parsing ~6 MB of
+# Python source on every start. The snapshot is rebuilt only when a source
+# file's mtime changes AND its content hash no longer matches.
+#
+# Synonym lists are cleaned once at compile time (see compile_candidates):
+# every stored value is a tuple of usable replacements, so lookups never
+# have to normalise or filter on the hot path.
+#
+# Build it ahead of deployment with:
+#     python vocab_snapshot.py [--force]
+
+from array import array
+from collections.abc import Mapping
+import hashlib
+import marshal
+import mmap
+import os
+import runpy
+import struct
+import sys
+import time
+import zlib
+
+SNAPSHOT_MAGIC = b'XRVOCAB\x00'
+SNAPSHOT_VERSION = 4
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+VOCABULARY_DIR = os.path.join(BASE_DIR, 'vocabulary')
+DEFAULT_SNAPSHOT_PATH = os.environ.get(
+    'REWRITER_SNAPSHOT_PATH',
+    os.path.join(VOCABULARY_DIR, '.vocabulary.snapshot')
+)
+
+# (file name, dict variable) - loaded in this order, later sources win
+BASE_SOURCES = [
+    ('health_terms.py', 'health_terms'),
+    ('health_terms_2.py', 'health_terms'),
+    ('generalwords.py', 'general_words'),
+]
+
+# magic, version, header length
+_PREAMBLE = struct.Struct('<8sII')
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, corrupt or from another version"""
+
+
+# =========================
+# SOURCE DISCOVERY & PARSING
+# =========================
+def synonym_source_files():
+    """Sorted paths of the alphabetical vocabulary/synonyms_NNN.py shards"""
+    if not os.path.isdir(VOCABULARY_DIR):
+        return []
+    names = [f for f in os.listdir(VOCABULARY_DIR)
+             if f.startswith('synonyms_') and f.endswith('.py')]
+    return [os.path.join(VOCABULARY_DIR, f) for f in sorted(names)]
+
+
+def source_files():
+    """Every vocabulary source, in load order"""
+    base = [os.path.join(BASE_DIR, name) for name, _ in BASE_SOURCES]
+    return [path for path in base if os.path.exists(path)] + synonym_source_files()
+
+
+def parse_synonym_source(content):
+    """Line parser for the synonyms = {...} shard format"""
+    synonyms = {}
+    lines = content.split('\n')
+    in_synonyms = False
+
+    for line in lines:
+        line = line.strip()
+
+        if not line or line.startswith('#'):
+            continue
+
+        if 'synonyms = {' in line:
+            in_synonyms = True
+            continue
+
+        if in_synonyms and '}' in line:
+            break
+
+        if in_synonyms and ':' in line:
+            # Simple key-value extraction
+            parts = line.split(':', 1)
+            if len(parts) == 2:
+                key = parts[0].strip().strip('"\'')
+                value_str = parts[1].strip().rstrip(',')
+
+                if value_str.startswith('[') and value_str.endswith(']'):
+                    # List value
+                    items = value_str[1:-1].split(',')
+                    values = [item.strip().strip('"\'') for item in items if item.strip()]
+                    synonyms[key] = values
+                else:
+                    # String value
+                    value = value_str.strip('"\'')
+                    synonyms[key] = value
+
+    return synonyms
+
+
+def _load_base_source(path, variable):
+    """Execute a base vocabulary module fresh and return its dict"""
+    return runpy.run_path(path).get(variable, {})
+
+
+def compile_sources():
+    """Parse all sources into (vocabulary, per-source counts, synonym files loaded)"""
+    vocabulary = {}
+    counts = []
+    loaded_files = 0
+
+    for name, variable in BASE_SOURCES:
+        path = os.path.join(BASE_DIR, name)
+        if not os.path.exists(path):
+            continue
+        words = _load_base_source(path, variable)
+        vocabulary.update(words)
+        counts.append((name, len(words)))
+
+    for path in synonym_source_files():
+        with open(path, 'r', encoding='utf-8') as f:
+            synonyms = parse_synonym_source(f.read())
+        counts.append((os.path.basename(path), len(synonyms)))
+        if synonyms:
+            vocabulary.update(synonyms)
+            loaded_files += 1
+
+    return vocabulary, counts, loaded_files
+
+
+def candidate_tuple(key, values):
+    """Usable replacements for a headword: no blanks, no self-synonyms, always a tuple"""
+    if isinstance(values, str):
+        values = (values,)
+    elif not isinstance(values, (list, tuple)):
+        values = (str(values),)
+    key = key.lower()
+    candidates = []
+    for value in values:
+        value = str(value).strip()
+        if value and value.lower() != key:
+            candidates.append(value)
+    return tuple(candidates)
+
+
+def compile_candidates(vocabulary):
+    """Headword -> candidate tuple; blank headwords and ones without candidates are dropped"""
+    candidates = {}
+    for key, values in vocabulary.items():
+        if not key.strip():
+            continue
+        values = candidate_tuple(key, values)
+        if values:
+            candidates[key] = values
+    return candidates
+
+
+# =========================
+# MANIFEST
+# =========================
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def build_manifest(paths=None):
+    """(relative path, size, mtime_ns, sha256) for each source"""
+    manifest = []
+    for path in paths if paths is not None else source_files():
+        st = os.stat(path)
+        manifest.append((os.path.relpath(path, BASE_DIR), st.st_size,
+                         st.st_mtime_ns, _file_hash(path)))
+    return manifest
+
+
+def manifest_is_current(manifest):
+    """True when no source was added, removed or changed since the manifest was taken.
+
+    A cheap stat() check runs first; files whose size and mtime still match are
+    trusted, files whose mtime moved are re-hashed before being declared stale.
+    """
+    current = source_files()
+    if [os.path.relpath(p, BASE_DIR) for p in current] != [entry[0] for entry in manifest]:
+        return False
+
+    for path, (_, size, mtime_ns, digest) in zip(current, manifest):
+        st = os.stat(path)
+        if st.st_size != size:
+            return False
+        if st.st_mtime_ns != mtime_ns and _file_hash(path) != digest:
+            return False
+    return True
+
+
+def manifest_fingerprint(manifest):
+    """Short digest of the source contents and snapshot format - changes whenever output could"""
+    digest = hashlib.sha256(f'v{SNAPSHOT_VERSION}'.encode('utf-8'))
+    for path, _, _, file_digest in manifest:
+        digest.update(f'{path}:{file_digest}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+# =========================
+# INTERNED SYNONYM STORE
+# =========================
+#
+# Payload layout (all arrays are native uint32, 8-byte aligned):
+#   pool            utf-8 bytes of every distinct string (headwords + synonyms)
+#   string_offsets  string i is pool[string_offsets[i]:string_offsets[i + 1]]
+#   key_ids         string id of each headword, sorted by headword
+#   value_offsets   synonyms of headword k are value_ids[value_offsets[k]:value_offsets[k + 1]]
+#   value_ids       string ids of synonyms
+#   hash_table      open-addressing table (crc32 of headword) -> headword index
+#
+# Nothing is decoded until a lookup asks for it, so every worker mapping the
+# same file shares one physical copy through the page cache.
+
+_EMPTY_SLOT = 0xFFFFFFFF
+_SECTIONS = ('pool', 'string_offsets', 'key_ids', 'value_offsets', 'value_ids', 'hash_table')
+
+
+def _align(n, boundary=8):
+    return (n + boundary - 1) // boundary * boundary
+
+
+def _encode_store(vocabulary):
+    """Intern every string of a compile_candidates() mapping; return the _SECTIONS payload"""
+    string_ids = {}
+    strings = []
+
+    def intern(text):
+        string_id = string_ids.get(text)
+        if string_id is None:
+            string_id = string_ids[text] = len(strings)
+            strings.append(text)
+        return string_id
+
+    keys = sorted(vocabulary)
+    key_ids = array('I', (intern(key) for key in keys))
+    value_offsets = array('I', [0])
+    value_ids = array('I')
+    for key in keys:
+        value_ids.extend(intern(value) for value in vocabulary[key])
+        value_offsets.append(len(value_ids))
+
+    pool = bytearray()
+    string_offsets = array('I', [0])
+    for text in strings:
+        pool += text.encode('utf-8')
+        string_offsets.append(len(pool))
+
+    table_size = 1 << max(1, (len(keys) * 2 - 1).bit_length())
+    mask = table_size - 1
+    hash_table = array('I', [_EMPTY_SLOT]) * table_size
+    for index, key in enumerate(keys):
+        slot = zlib.crc32(key.encode('utf-8')) & mask
+        while hash_table[slot] != _EMPTY_SLOT:
+            slot = (slot + 1) & mask
+        hash_table[slot] = index
+
+    return [bytes(pool), string_offsets.tobytes(), key_ids.tobytes(),
+            value_offsets.tobytes(), value_ids.tobytes(), hash_table.tobytes()], len(strings)
+
+
+class SynonymStore(Mapping):
+    """Read-only headword -> candidate tuple mapping over a memory-mapped snapshot"""
+
+    def __init__(self, path=None):
+        self.path = path or DEFAULT_SNAPSHOT_PATH
+        with open(self.path, 'rb') as f:
+            self.header, data_start = _read_header(f, self.path)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.header.get('byteorder') != sys.byteorder:
+            raise SnapshotError(f'{self.path}: built on a {self.header.get("byteorder")}-endian machine')
+
+        view = memoryview(self._mmap)
+        sections = {}
+        for name in _SECTIONS:
+            offset, length = self.header['sections'][name]
+            if data_start + offset + length > len(self._mmap):
+                raise SnapshotError(f'{self.path}: truncated {name} section')
+            section = view[data_start + offset:data_start + offset + length]
+            sections[name] = section if name == 'pool' else section.cast('I')
+
+        self._pool = sections['pool']
+        self._string_offsets = sections['string_offsets']
+        self._key_ids = sections['key_ids']
+        self._value_offsets = sections['value_offsets']
+        self._value_ids = sections['value_ids']
+        self._hash_table = sections['hash_table']
+        self._mask = len(self._hash_table) - 1
+
+    def __reduce__(self):
+        # Worker processes re-map the file instead of copying its contents
+        return (SynonymStore, (self.path,))
+
+    def _string(self, string_id):
+        offsets = self._string_offsets
+        return str(self._pool[offsets[string_id]:offsets[string_id + 1]], 'utf-8')
+
+    def _find(self, key):
+        """Headword index of key, or -1"""
+        encoded = key.encode('utf-8')
+        offsets = self._string_offsets
+        slot = zlib.crc32(encoded) & self._mask
+        while True:
+            index = self._hash_table[slot]
+            if index == _EMPTY_SLOT:
+                return -1
+            string_id = self._key_ids[index]
+            if self._pool[offsets[string_id]:offsets[string_id + 1]] == encoded:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def _values(self, index):
+        start, end = self._value_offsets[index], self._value_offsets[index + 1]
+        return tuple(self._string(string_id) for string_id in self._value_ids[start:end])
+
+    def __getitem__(self, key):
+        index = self._find(key) if isinstance(key, str) else -1
+        if index < 0:
+            raise KeyError(key)
+        return self._values(index)
+
+    def get(self, key, default=None):
+        index = self._find(key) if isinstance(key, str) else -1
+        return self._values(index) if index >= 0 else default
+
+    def choose(self, key, rng):
+        """One random candidate for key (or None), decoding only that string"""
+        index = self._find(key)
+        if index < 0:
+            return None
+        start = self._value_offsets[index]
+        return self._string(self._value_ids[start + rng.randrange(self._value_offsets[index + 1] - start)])
+
+    def __contains__(self, key):
+        return isinstance(key, str) and self._find(key) >= 0
+
+    def __len__(self):
+        return len(self._key_ids)
+
+    def __iter__(self):
+        for string_id in self._key_ids:
+            yield self._string(string_id)
+
+    def phrase_keys(self):
+        """Multi-word headwords, filtered on raw bytes before decoding"""
+        offsets = self._string_offsets
+        for string_id in self._key_ids:
+            encoded = bytes(self._pool[offsets[string_id]:offsets[string_id + 1]])
+            if b' ' in encoded:
+                yield encoded.decode('utf-8')
+
+    def headword_index(self, key):
+        """Stable integer id of a headword within this snapshot, or -1"""
+        return self._find(key)
+
+    @property
+    def string_count(self):
+        return len(self._string_offsets) - 1
+
+
+# =========================
+# READ / WRITE
+# =========================
+def build_snapshot(path=None):
+    """Compile all sources and atomically write a fresh snapshot"""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    paths = source_files()
+    manifest = build_manifest(paths)
+    raw_vocabulary, counts, loaded_files = compile_sources()
+    vocabulary = compile_candidates(raw_vocabulary)
+    payload, string_count = _encode_store(vocabulary)
+
+    sections = {}
+    offset = 0
+    for name, blob in zip(_SECTIONS, payload):
+        sections[name] = (offset, len(blob))
+        offset = _align(offset + len(blob))
+
+    header = marshal.dumps({
+        'version': SNAPSHOT_VERSION,
+        'built_at': time.time(),
+        'byteorder': sys.byteorder,
+        'manifest': manifest,
+        'counts': counts,
+        'loaded_files': loaded_files,
+        'total_words': len(vocabulary),
+        'dropped_headwords': len(raw_vocabulary) - len(vocabulary),
+        'unique_strings': string_count,
+        'sections': sections,
+    })
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)))
+        f.write(header)
+        data_start = _align(_PREAMBLE.size + len(header))
+        for name, blob in zip(_SECTIONS, payload):
+            f.seek(data_start + sections[name][0])
+            f.write(blob)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(f, path):
+    """Parse the preamble and header; return (header, offset of the payload)"""
+    preamble = f.read(_PREAMBLE.size)
+    if len(preamble) != _PREAMBLE.size:
+        raise SnapshotError(f'{path}: truncated snapshot')
+    magic, version, header_len = _PREAMBLE.unpack(preamble)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError(f'{path}: not a vocabulary snapshot')
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f'{path}: snapshot version {version}, expected {SNAPSHOT_VERSION}')
+    return marshal.loads(f.read(header_len)), _align(_PREAMBLE.size + header_len)
+
+
+def read_snapshot_header(path=None):
+    """Return the header dict of a snapshot without mapping its payload"""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    with open(path, 'rb') as f:
+        return _read_header(f, path)[0]
+
+
+def read_snapshot(path=None):
+    """Map a snapshot file and return (header, SynonymStore)"""
+    store = SynonymStore(path)
+    return store.header, store
+
+
+def load_snapshot(path=None):
+    """Return (header, SynonymStore), rebuilding the snapshot first if it is stale"""
+    path = path or DEFAULT_SNAPSHOT_PATH
+    try:
+        header = read_snapshot_header(path)
+        if not manifest_is_current(header['manifest']):
+            raise SnapshotError(f'{path}: vocabulary sources changed')
+    except (OSError, SnapshotError, KeyError, EOFError, ValueError):
+        build_snapshot(path)
+    return read_snapshot(path)
+
+
+# =========================
+# BUILD STEP
+# =========================
+if __name__ == "__main__":
+    force = '--force' in sys.argv[1:]
+    started = time.perf_counter()
+
+    if force:
+        build_snapshot()
+        header, vocabulary = read_snapshot()
+    else:
+        header, vocabulary = load_snapshot()
+
+    print(f"✅ SNAPSHOT: {DEFAULT_SNAPSHOT_PATH}")
+    print(f"✅ VERSION: {header['version']}")
+    print(f"✅ SOURCES: {len(header['manifest'])}")
+    print(f"✅ TOTAL UNIQUE WORDS: {header['total_words']:,}")
+    print(f"✅ DROPPED (NO CANDIDATES): {header['dropped_headwords']:,}")
+    print(f"✅ INTERNED STRINGS: {header['unique_strings']:,}")
+    print(f"⏱️ {time.perf_counter() - started:.2f}s")